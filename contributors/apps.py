@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ContributorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'contributors'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+
+from .models import Contributor
+from .tokens import claimed_roles
+
+User = get_user_model()
+
+
+class MembershipCache:
+    """ Cache local au processus des membres d'un projet : {user_id: frozenset(rôles)}
+        - Borné à MAX_ENTRIES projets, les moins récemment utilisés sont évincés en premier
+        - Chaque entrée expire après TIMEOUT secondes
+        - Invalidé par les signaux post_save / post_delete de Contributor
+    """
+
+    def __init__(self, max_entries=10000, timeout=60):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_options = getattr(settings, 'MEMBERSHIP_CACHE', {})
+cache = MembershipCache(max_entries=_options.get('MAX_ENTRIES', 10000), timeout=_options.get('TIMEOUT', 60))
+
+
+def project_members(project_id):
+    """ Retourne les membres du projet sous la forme {user_id: frozenset(rôles)}.
+        Un dictionnaire vide signifie que le projet n'existe pas (tout projet a un responsable).
+    """
+    project_id = int(project_id)
+    members = cache.get(project_id)
+    if members is None:
+        roles = {}
+        for user_id, role in Contributor.objects.filter(project_id=project_id).values_list('user_id', 'role'):
+            roles.setdefault(user_id, set()).add(role)
+        members = {user_id: frozenset(user_roles) for user_id, user_roles in roles.items()}
+        cache.set(project_id, members)
+    return members
+
+
+def user_roles(request, project_id):
+    """ Rôles de l'utilisateur connecté dans le projet, résolus une seule fois par requête :
+        d'abord depuis le jeton JWT s'il porte des rôles à jour, sinon depuis le cache des membres.
+        Retourne None si le projet n'existe pas.
+    """
+    project_id = int(project_id)
+    resolved = request.__dict__.setdefault('_project_roles', {})
+    if project_id not in resolved:
+        roles = claimed_roles(request, project_id)
+        if roles is None:
+            members = project_members(project_id)
+            roles = members.get(request.user.id, frozenset()) if members else None
+        resolved[project_id] = roles
+    return resolved[project_id]
+
+
+def invalidate(project_id):
+    cache.delete(int(project_id))
+
+
+_bulk = threading.local()
+
+
+def in_bulk():
+    return getattr(_bulk, 'active', False)
+
+
+def members_changed(project_id, user_ids):
+    """ Des adhésions au projet ont changé :
+        - le cache des membres du projet est invalidé, immédiatement puis à la validation
+          de la transaction (une autre requête a pu relire entre temps l'état non encore validé)
+        - la version des adhésions des utilisateurs est incrémentée : les rôles inscrits
+          dans leurs jetons JWT deviennent périmés et ne sont plus utilisés
+          (la version gardée en cache par l'authentification est invalidée de même)
+        Sans effet à l'intérieur de bulk_changes(), qui traite l'ensemble en une fois.
+    """
+    if in_bulk():
+        return
+    from users.authentication import forget_users  # users.authentication importe ce module
+    invalidate(project_id)
+    transaction.on_commit(lambda: invalidate(project_id))
+    User.objects.filter(pk__in=user_ids).update(membership_version=F('membership_version') + 1)
+    forget_users(user_ids)
+    transaction.on_commit(lambda: forget_users(user_ids))
+
+
+@contextmanager
+def bulk_changes(project_id, user_ids):
+    """ Regroupe les signaux émis par une modification en masse des contributeurs du projet
+        en un seul appel à members_changed() (bulk_create n'émet d'ailleurs aucun signal).
+    """
+    _bulk.active = True
+    try:
+        yield
+    finally:
+        _bulk.active = False
+    members_changed(project_id, user_ids)
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.9 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contributors', '0003_contributor_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contributor',
+            name='created_time',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.9 on 2026-10-18 19:27
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_contributors(apps, schema_editor):
+    """ Conserve la plus ancienne ligne de chaque triplet (projet, utilisateur, rôle) avant la contrainte d'unicité """
+    Contributor = apps.get_model('contributors', 'Contributor')
+    kept = (Contributor.objects.values('project_id', 'user_id', 'role')
+            .annotate(kept_id=Min('id')).values_list('kept_id', flat=True))
+    Contributor.objects.exclude(id__in=list(kept)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contributors', '0004_contributor_created_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contributor',
+            index=models.Index(fields=['project', 'role', 'created_time'], name='contributor_project_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contributor',
+            index=models.Index(fields=['user', 'project', 'role'], name='contributor_user_project_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_contributors, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='contributor',
+            constraint=models.UniqueConstraint(fields=('project', 'user', 'role'), name='unique_contributor_role'),
+        ),
+    ]
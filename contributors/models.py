@@ -15,6 +15,16 @@ class Contributor(models.Model):
     role = models.CharField(max_length=30, choices=ROLE_CHOICE, default=OWNER)
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_time = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'user', 'role'], name='unique_contributor_role'),
+        ]
+        indexes = [
+            models.Index(fields=['project', 'role', 'created_time'], name='contributor_project_role_idx'),
+            models.Index(fields=['user', 'project', 'role'], name='contributor_user_project_idx'),
+        ]
 
     def __str__(self):
         return f"Contributor id : {self.pk}"
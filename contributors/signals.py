@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .membership import members_changed
+from .models import Contributor
+
+
+@receiver([post_save, post_delete], sender=Contributor)
+def contributor_changed(sender, instance, **kwargs):
+    """ Toute modification d'un contributeur invalide le cache des membres de son projet
+        et les rôles inscrits dans les jetons de l'utilisateur.
+    """
+    members_changed(instance.project_id, [instance.user_id])
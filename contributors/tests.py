@@ -1,3 +1,92 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from projects.cache import response_cache
+from projects.models import Project
+from users.models import User
+from . import membership
+from .models import Contributor
+
+
+class MembershipCacheTests(TestCase):
+
+    def test_lru_eviction(self):
+        cache = membership.MembershipCache(max_entries=2, timeout=60)
+        cache.set(1, 'a')
+        cache.set(2, 'b')
+        cache.get(1)
+        cache.set(3, 'c')
+        self.assertEqual(cache.get(1), 'a')
+        self.assertIsNone(cache.get(2))
+
+    def test_expiration(self):
+        cache = membership.MembershipCache(max_entries=2, timeout=-1)
+        cache.set(1, 'a')
+        self.assertIsNone(cache.get(1))
+
+
+class MembershipResolverTests(APITestCase):
+
+    def setUp(self):
+        membership.cache.clear()
+        self.owner = User.objects.create_user(email='owner@test.fr', password='secret')
+        self.other = User.objects.create_user(email='other@test.fr', password='secret')
+        self.project = Project.objects.create(title='Projet', description='Description', author_user_id=self.owner.id)
+        Contributor.objects.create(project=self.project, user=self.owner, role=Contributor.OWNER)
+        Contributor.objects.create(project=self.project, user=self.owner, role=Contributor.CONTRIBUTOR)
+        self.client.force_authenticate(self.owner)
+
+    def test_members(self):
+        self.assertEqual(membership.project_members(self.project.id),
+                         {self.owner.id: frozenset([Contributor.OWNER, Contributor.CONTRIBUTOR])})
+        self.assertEqual(membership.project_members(self.project.id + 1), {})
+
+    def test_warm_cache_skips_membership_queries(self):
+        url = reverse('project-detail', args=[self.project.id])
+        self.client.get(url)
+        response_cache.backend.clear()
+        with self.assertNumQueries(4) as context:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse(any('contributors_contributor' in query['sql'] for query in context.captured_queries))
+
+    def test_invalidated_on_save_and_delete(self):
+        membership.project_members(self.project.id)
+        contributor = Contributor.objects.create(project=self.project, user=self.other, role=Contributor.CONTRIBUTOR)
+        self.assertIn(self.other.id, membership.project_members(self.project.id))
+        contributor.delete()
+        self.assertNotIn(self.other.id, membership.project_members(self.project.id))
+
+
+@override_settings(JWT_PROJECT_CLAIMS=True)
+class ProjectClaimsTests(APITestCase):
+
+    def setUp(self):
+        membership.cache.clear()
+        self.user = User.objects.create_user(email='owner@test.fr', password='secret')
+        self.project = Project.objects.create(title='Projet', description='Description', author_user_id=self.user.id)
+        Contributor.objects.create(project=self.project, user=self.user, role=Contributor.OWNER)
+        Contributor.objects.create(project=self.project, user=self.user, role=Contributor.CONTRIBUTOR)
+        self.tokens = self.client.post(reverse('token_obtain_pair'),
+                                       {'email': 'owner@test.fr', 'password': 'secret'}).data
+        self.url = reverse('project-detail', args=[self.project.id])
+
+    def get_project(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        return [query['sql'] for query in context.captured_queries if 'contributors_contributor' in query['sql']]
+
+    def test_authorized_from_token(self):
+        self.assertEqual(self.get_project(self.tokens['access']), [])
+
+    def test_stale_claims_fall_back_then_refresh(self):
+        other = Project.objects.create(title='Autre', description='Description', author_user_id=self.user.id)
+        Contributor.objects.create(project=other, user=self.user, role=Contributor.OWNER)
+        self.assertEqual(len(self.get_project(self.tokens['access'])), 1)
+
+        membership.cache.clear()
+        access = self.client.post(reverse('token_refresh'), {'refresh': self.tokens['refresh']}).data['access']
+        self.assertEqual(self.get_project(access), [])
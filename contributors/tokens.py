@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import Contributor
+
+User = get_user_model()
+
+PROJECTS_CLAIM = 'prj'
+VERSION_CLAIM = 'mv'
+
+
+def add_project_claims(token, user_id):
+    """ Ajoute au jeton la carte {id projet: rôles} de l'utilisateur, par exemple {"12": "CO"},
+        et la version de ses adhésions au moment de l'émission.
+        La version est lue avant les rôles : une modification concurrente rend le jeton périmé, jamais faux.
+    """
+    version = User.objects.filter(pk=user_id).values_list('membership_version', flat=True).first()
+    roles = {}
+    for project_id, role in Contributor.objects.filter(user_id=user_id).values_list('project_id', 'role'):
+        roles[str(project_id)] = roles.get(str(project_id), '') + role
+    token[PROJECTS_CLAIM] = {project_id: ''.join(sorted(role)) for project_id, role in roles.items()}
+    token[VERSION_CLAIM] = version
+
+
+def claimed_roles(request, project_id):
+    """ Rôles de l'utilisateur dans le projet d'après son jeton, sans requête SQL.
+        Retourne None si le mode est désactivé, si le jeton ne porte pas le projet
+        ou si ses adhésions ont changé depuis l'émission du jeton (version périmée).
+    """
+    if not settings.JWT_PROJECT_CLAIMS:
+        return None
+    token = getattr(request, 'auth', None)
+    if token is None or token.get(VERSION_CLAIM) != getattr(request.user, 'membership_version', None):
+        return None
+    roles = token.get(PROJECTS_CLAIM, {}).get(str(project_id))
+    return frozenset(roles) if roles else None
+
+
+class ProjectClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """ Connexion : les rôles par projet sont inscrits dans le jeton si JWT_PROJECT_CLAIMS est actif """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        if settings.JWT_PROJECT_CLAIMS:
+            add_project_claims(token, user.pk)
+        return token
+
+
+class ProjectClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """ Rafraîchissement : le jeton d'accès est réémis avec les rôles actuels de l'utilisateur """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        if settings.JWT_PROJECT_CLAIMS:
+            access = AccessToken(data['access'])
+            add_project_claims(access, access[api_settings.USER_ID_CLAIM])
+            data['access'] = str(access)
+        return data
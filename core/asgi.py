@@ -2,6 +2,8 @@
 ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests served through it are resolved with core/urls_asgi.py, where the hot
+read endpoints are async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -9,8 +11,19 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+
+class AsyncReadRequest(ASGIRequest):
+    urlconf = 'core.urls_asgi'
+
+
+class AsyncReadHandler(ASGIHandler):
+    request_class = AsyncReadRequest
+
+
+django.setup(set_prefix=False)
+application = AsyncReadHandler()
@@ -0,0 +1,100 @@
+import os
+from contextlib import contextmanager
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.backends.sqlite3 import base, creation
+
+# Réglages appliqués à chaque nouvelle connexion, modifiables par OPTIONS['pragmas'] de DATABASES
+PRAGMAS = {
+    'journal_mode': 'WAL',  # les lectures ne bloquent plus l'écriture, et inversement
+    'synchronous': 'NORMAL',  # sûr en WAL : seule la dernière transaction peut être perdue en cas de coupure
+    'busy_timeout': 5000,  # ms d'attente du verrou d'écriture avant « database is locked »
+    'cache_size': -20000,  # Kio de cache de pages par connexion
+    'mmap_size': 268435456,  # lectures par projection en mémoire, jusqu'à 256 Mio
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+WAL_SUFFIXES = ('-wal', '-shm')
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """ Base de test sur disque : ses fichiers -wal et -shm sont supprimés avec elle.
+        Ceux laissés par une connexion d'un autre thread encore ouverte ne s'appliquent pas à la base suivante.
+    """
+
+    def remove_wal_files(self, test_database_name):
+        if not self.is_in_memory_db(test_database_name):
+            for suffix in WAL_SUFFIXES:
+                if os.path.exists(f'{test_database_name}{suffix}'):
+                    os.remove(f'{test_database_name}{suffix}')
+
+    def _create_test_db(self, verbosity, autoclobber, keepdb=False):
+        test_database_name = super()._create_test_db(verbosity, autoclobber, keepdb)
+        if not keepdb:
+            self.remove_wal_files(test_database_name)
+        return test_database_name
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        super()._destroy_test_db(test_database_name, verbosity)
+        self.remove_wal_files(test_database_name)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """ SQLite réglé pour la production (ENGINE 'core.db') :
+        - PRAGMAS exécutés à l'ouverture de chaque connexion (à réutiliser avec CONN_MAX_AGE)
+        - transactions ouvertes par BEGIN IMMEDIATE (OPTIONS['transaction_mode']) : le verrou d'écriture
+          est pris dès le début de la transaction, en attendant au plus busy_timeout. Une transaction
+          DEFERRED qui lit puis écrit échoue immédiatement avec « database is locked » si une autre
+          connexion écrit entre-temps, sans attendre.
+        - à la fermeture, le journal WAL est reporté dans le fichier de la base puis vidé : le fichier
+          de la base est complet à lui seul dès qu'aucune autre connexion ne l'utilise
+    """
+    creation_class = DatabaseCreation
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        self.transaction_mode = params.pop('transaction_mode', 'IMMEDIATE').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f"OPTIONS['transaction_mode'] doit valoir {', '.join(TRANSACTION_MODES)}.")
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                try:
+                    # Sans attendre : avec d'autres connexions actives, la dernière fermée fera le report
+                    self.connection.execute('PRAGMA busy_timeout = 0')
+                    self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                except base.Database.Error:
+                    pass
+                return self.connection.close()
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
+
+
+@contextmanager
+def read_snapshot(using=DEFAULT_DB_ALIAS):
+    """ Transaction de lecture : toutes les requêtes du bloc voient le même état de la base.
+        Ouverte par BEGIN DEFERRED même avec core.db : en WAL, un instantané de lecture ne prend
+        aucun verrou et n'empêche pas les écritures pendant une longue lecture (export en flux).
+    """
+    connection = connections[using]
+    connection.ensure_connection()
+    mode = getattr(connection, 'transaction_mode', 'DEFERRED')
+    connection.transaction_mode = 'DEFERRED'
+    try:
+        with transaction.atomic(using=using):
+            # BEGIN DEFERRED exécuté : le mode configuré vaut de nouveau pour les transactions suivantes
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
@@ -0,0 +1,79 @@
+import asyncio
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.urls import Resolver404, get_resolver
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class HybridMiddleware:
+    """ Base des middlewares du projet, utilisables sous WSGI comme sous ASGI.
+        Sous ASGI, un middleware uniquement synchrone fait passer toute la chaîne par l'unique thread
+        de sync_to_async (thread_sensitive) : les requêtes sont alors traitées une par une.
+        Les sous-classes définissent handle() (synchrone) et ahandle() (coroutine) ;
+        Django choisit la version d'après le point d'entrée.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Reconnu comme coroutine par asyncio.iscoroutinefunction, comme MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+def atomic_write(view, request, *args, **kwargs):
+    """ Exécute une vue d'écriture dans une transaction, annulée si la réponse est une erreur """
+    with transaction.atomic():
+        response = view(request, *args, **kwargs)
+        if response.status_code >= 400:
+            transaction.set_rollback(True)
+    return response
+
+
+def needs_transaction(request):
+    """ Requête d'écriture vers une vue synchrone qui n'est pas marquée par transaction.non_atomic_requests """
+    if request.method not in WRITE_METHODS:
+        return False
+    try:
+        view = get_resolver(getattr(request, 'urlconf', None)).resolve(request.path_info).func
+    except Resolver404:
+        return False
+    return not asyncio.iscoroutinefunction(view) and DEFAULT_DB_ALIAS not in getattr(view, '_non_atomic_requests', ())
+
+
+class WriteTransactionMiddleware(HybridMiddleware):
+    """ Chaque vue d'écriture s'exécute dans une seule transaction, ouverte par BEGIN IMMEDIATE
+        avec le moteur core.db : le verrou d'écriture de SQLite est pris une fois, au début, au lieu
+        d'une fois par INSERT ou UPDATE (vérifications, écriture, compteurs, journal des modifications).
+        - Dernier middleware de la liste : la transaction couvre le traitement de la requête par Django
+          (process_view, vue, process_exception, rendu de la réponse), pas les autres middlewares
+        - Une réponse d'erreur (4xx, 5xx, exception convertie en 500) annule la transaction :
+          une vue qui échoue après une première écriture ne laisse rien en base
+        - Les vues marquées par transaction.non_atomic_requests en sont exclues : connexion et inscription,
+          dont le hachage du mot de passe garderait le verrou pendant des dizaines de millisecondes
+        - Les vues asynchrones (projects/asynchronous.py) appellent atomic_write elles-mêmes,
+          dans le thread où s'exécute la vue
+        - Les lectures restent en autocommit, n'attendent jamais le verrou d'écriture (WAL)
+          et ne changent pas de thread sous ASGI
+        - Sous ASGI, la transaction est ouverte dans le thread de sync_to_async (thread_sensitive),
+          celui où Django exécute ensuite la vue synchrone
+    """
+
+    def handle(self, request):
+        if not needs_transaction(request):
+            return self.get_response(request)
+        return atomic_write(self.get_response, request)
+
+    async def ahandle(self, request):
+        if not needs_transaction(request):
+            return await self.get_response(request)
+        return await sync_to_async(atomic_write)(async_to_sync(self.get_response), request)
@@ -44,16 +44,21 @@ INSTALLED_APPS = [
     'users',
     'projects',
     'contributors',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.MetricsMiddleware',
+    'monitoring.queries.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'monitoring.profiling.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.WriteTransactionMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -80,14 +85,48 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# core.db is the sqlite3 backend tuned for concurrent use: WAL journal, synchronous=NORMAL,
+# busy_timeout, mmap and page cache pragmas on connect (override them with OPTIONS['pragmas'])
+# and transactions opened with BEGIN IMMEDIATE (OPTIONS['transaction_mode']). Connections are
+# kept for CONN_MAX_AGE seconds so the pragmas run once per connection, not once per request.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # On-disk test database: WAL and busy_timeout do not apply to the shared in-memory database,
+        # where a write transaction locks whole tables for the concurrent readers of the load tests
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# 'responses' holds serialized project and issue reads (projects.cache). Local memory
+# is per process; with several workers use a shared backend, e.g.
+# 'django.core.cache.backends.filebased.FileBasedCache' with LOCATION set to a directory.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -136,14 +175,67 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedUserJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'projects.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
+
+# Embed the user's project roles in access tokens (contributors.tokens) so that
+# permission checks need no query while the user's memberships are unchanged
+JWT_PROJECT_CLAIMS = False
+
+# Process-local cache of project members (contributors.membership)
+MEMBERSHIP_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+}
+
+# Process-local cache of the authenticated users' state (users.authentication).
+# Entries are dropped when a user is saved in this process; TIMEOUT bounds how long
+# another process may keep serving a deactivated user.
+USER_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+}
+
+# Per-route request metrics (monitoring), exposed at /metrics to ALLOWED_IPS.
+# With several worker processes, set DIR to a directory shared by the workers: each
+# process writes its own metrics-<pid>.json every FLUSH_INTERVAL seconds and /metrics
+# adds them up. Files of processes that have exited, or that were not rewritten for
+# STALE_AFTER seconds, are deleted when /metrics is read. A worker only writes its file
+# while it serves requests: keep STALE_AFTER well above FLUSH_INTERVAL so that a briefly
+# idle worker is not dropped from the totals.
+METRICS = {
+    'DIR': None,
+    'FLUSH_INTERVAL': 5,
+    'STALE_AFTER': 300,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+}
+
+# Repeated-query (N+1) and query-budget checks for development (monitoring.queries).
+# When ENABLED, every request whose SQL repeats a statement THRESHOLD times or more, or
+# exceeds its budget, is logged with the stack of the first offending query. BUDGETS maps
+# URL names, or "METHOD url-name", to a maximum number of queries, e.g. {'GET issue': 3}.
+# Tests opt in with monitoring.testing.QueryInspectionMixin.
+QUERY_INSPECTOR = {
+    'ENABLED': False,
+    'THRESHOLD': 3,
+    'BUDGETS': {},
+}
+
+# On-demand cProfile of a single request (monitoring.profiling), for superusers only:
+# send the X-Profile header or add ?profile=1. Profiles are written to DIR, listed in
+# the admin, and only the MAX_FILES most recent ones are kept.
+PROFILER = {
+    'DIR': BASE_DIR / 'profiles',
+    'MAX_FILES': 100,
+}
@@ -14,14 +14,22 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.db.transaction import non_atomic_requests
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from contributors.tokens import ProjectClaimsTokenObtainPairSerializer, ProjectClaimsTokenRefreshSerializer
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('signup/', include("users.urls")),
-    path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('login/', non_atomic_requests(
+        TokenObtainPairView.as_view(serializer_class=ProjectClaimsTokenObtainPairSerializer)),
+         name='token_obtain_pair'),
+    path('refresh/', non_atomic_requests(
+        TokenRefreshView.as_view(serializer_class=ProjectClaimsTokenRefreshSerializer)),
+         name='token_refresh'),
     path('projects/', include("projects.urls")),
+    path('metrics', include("monitoring.urls")),
 ]
@@ -0,0 +1,12 @@
+"""core URL Configuration for the ASGI entry point (core/asgi.py)
+
+Same routes as core/urls.py; the hot project, issue and comment reads are served by async views.
+"""
+from django.urls import path, include
+
+from core.urls import urlpatterns as wsgi_urlpatterns
+
+
+urlpatterns = [
+    path('projects/', include("projects.urls_asgi")),
+] + wsgi_urlpatterns
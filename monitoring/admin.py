@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from monitoring.models import Profile
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ['created_time', 'method', 'url_name', 'status', 'duration', 'file']
+    list_filter = ['url_name', 'method']
+    readonly_fields = [field.name for field in Profile._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
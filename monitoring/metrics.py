@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Nom Prometheus -> (aide, limites des intervalles)
+HISTOGRAMS = {
+    'http_request_duration_seconds': ("Durée de traitement des requêtes", LATENCY_BUCKETS),
+    'http_request_queries': ("Nombre de requêtes SQL par requête HTTP", QUERY_BUCKETS),
+    'http_request_db_seconds': ("Temps passé en base par requête HTTP", LATENCY_BUCKETS),
+    'http_response_size_bytes': ("Taille des réponses (hors réponses en flux)", SIZE_BUCKETS),
+}
+COUNTERS = {
+    'http_requests_total': "Nombre de requêtes HTTP par vue, méthode et statut",
+    'response_cache_hits_total': "Lectures servies par le cache des réponses",
+    'response_cache_misses_total': "Lectures absentes du cache des réponses",
+}
+LABELS = {
+    'http_requests_total': ('view', 'method', 'status'),
+    'response_cache_hits_total': (),
+    'response_cache_misses_total': (),
+}
+HISTOGRAM_LABELS = ('view', 'method')
+
+
+class Metrics:
+    """ Mesures du processus : histogrammes par (vue, méthode) et compteurs.
+        - observe() ne fait que quelques incréments sous verrou
+        - Si METRICS['DIR'] est défini, le processus y écrit son instantané (metrics-<pid>.json)
+          au plus toutes les FLUSH_INTERVAL secondes ; /metrics additionne les fichiers de tous les processus
+        - Les fichiers d'un processus terminé, ou non réécrits depuis STALE_AFTER secondes, sont supprimés
+          par collect() : les processus remplacés au redémarrage des workers ne restent pas comptés
+    """
+
+    def __init__(self, directory=None, flush_interval=5, stale_after=300):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._flushed = time.monotonic()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {name: {} for name in HISTOGRAMS}
+            self.counters = {name: {} for name in COUNTERS}
+
+    def observe(self, view, method, status, duration, queries, db_time, size):
+        labels = (view, method)
+        values = {
+            'http_request_duration_seconds': duration,
+            'http_request_queries': queries,
+            'http_request_db_seconds': db_time,
+            'http_response_size_bytes': size,
+        }
+        with self._lock:
+            for name, value in values.items():
+                if value is None:
+                    continue
+                series = self.histograms[name].get(labels)
+                if series is None:
+                    series = self.histograms[name][labels] = [[0] * (len(HISTOGRAMS[name][1]) + 1), 0.0]
+                series[0][bisect_left(HISTOGRAMS[name][1], value)] += 1
+                series[1] += value
+            key = (view, method, str(status))
+            self.counters['http_requests_total'][key] = self.counters['http_requests_total'].get(key, 0) + 1
+        if self.directory and time.monotonic() - self._flushed > self.flush_interval:
+            self.flush()
+
+    def snapshot(self):
+        """ Instantané sérialisable en JSON ; les compteurs du cache des réponses y sont ajoutés """
+        from projects.cache import response_cache
+
+        cache_stats = response_cache.stats()
+        with self._lock:
+            return {
+                'histograms': {name: [[list(labels), list(series[0]), series[1]] for labels, series in values.items()]
+                               for name, values in self.histograms.items()},
+                'counters': dict(
+                    {name: [[list(labels), value] for labels, value in values.items()]
+                     for name, values in self.counters.items() if name == 'http_requests_total'},
+                    response_cache_hits_total=[[[], cache_stats['hits']]],
+                    response_cache_misses_total=[[[], cache_stats['misses']]],
+                ),
+            }
+
+    @property
+    def path(self):
+        return self.directory / f'metrics-{os.getpid()}.json'
+
+    def flush(self):
+        """ Écrit l'instantané du processus, remplacé de façon atomique """
+        self._flushed = time.monotonic()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, self.path)
+
+    def collect(self):
+        """ Instantanés de tous les processus : celui-ci à jour, les autres depuis leur dernier fichier """
+        snapshots = [self.snapshot()]
+        if self.directory and self.directory.is_dir():
+            for path in self.directory.glob('metrics-*.json'):
+                if path == self.path:
+                    continue
+                try:
+                    if self.is_stale(path):
+                        path.unlink()
+                        continue
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue
+        return merge(snapshots)
+
+    def is_stale(self, path):
+        """ Fichier d'un processus terminé, ou trop ancien (processus d'une autre machine, pid réutilisé) """
+        if time.time() - path.stat().st_mtime > self.stale_after:
+            return True
+        pid = path.stem.rpartition('-')[2]
+        return pid.isdigit() and not process_exists(int(pid))
+
+
+def process_exists(pid):
+    """ Processus en cours sur cette machine (le signal 0 ne fait que vérifier son existence) """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge(snapshots):
+    histograms = {name: {} for name in HISTOGRAMS}
+    counters = {name: {} for name in COUNTERS}
+    for snapshot in snapshots:
+        for name, series in snapshot.get('histograms', {}).items():
+            for labels, buckets, total in series:
+                merged = histograms[name].setdefault(tuple(labels), [[0] * len(buckets), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+                merged[1] += total
+        for name, series in snapshot.get('counters', {}).items():
+            for labels, value in series:
+                counters[name][tuple(labels)] = counters[name].get(tuple(labels), 0) + value
+    return histograms, counters
+
+
+def label_text(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def render(histograms, counters):
+    """ Format texte d'exposition de Prometheus (version 0.0.4) """
+    lines = []
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for labels, (buckets, total) in sorted(histograms[name].items()):
+            cumulative = 0
+            for bound, count in zip(list(bounds) + ['+Inf'], buckets):
+                cumulative += count
+                lines.append(f'{name}_bucket{label_text(HISTOGRAM_LABELS, labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{label_text(HISTOGRAM_LABELS, labels)} {total}')
+            lines.append(f'{name}_count{label_text(HISTOGRAM_LABELS, labels)} {cumulative}')
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for labels, value in sorted(counters[name].items()):
+            lines.append(f'{name}{label_text(LABELS[name], labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+_options = getattr(settings, 'METRICS', {})
+metrics = Metrics(directory=_options.get('DIR'), flush_interval=_options.get('FLUSH_INTERVAL', 5),
+                  stale_after=_options.get('STALE_AFTER', 300))
@@ -0,0 +1,79 @@
+import time
+from contextvars import ContextVar
+
+from core.middleware import HybridMiddleware
+from .metrics import metrics
+
+# Méthodes gardées telles quelles dans les étiquettes, les autres (envoyées par le client) sont regroupées
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# Compteur de la requête HTTP en cours : propagé par asgiref aux threads de sync_to_async
+current_counter = ContextVar('current_counter', default=None)
+
+
+class QueryCounter:
+    """ execute_wrapper : compte les requêtes SQL et cumule leur durée """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def count_queries(execute, sql, params, many, context):
+    """ execute_wrapper installé sur chaque connexion (monitoring.signals) """
+    counter = current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """ Mesure chaque requête et l'enregistre sous le nom de la route résolue (project-detail, issue...).
+        - Les requêtes sans route (404) sont regroupées sous "unresolved", les méthodes inconnues sous "other"
+        - Les requêtes SQL sont comptées sur toutes les connexions qui servent la requête HTTP,
+          y compris celles du pool de threads des lectures asynchrones de core/asgi.py
+        - La taille des réponses en flux (export) n'est pas mesurée
+    """
+
+    def handle(self, request):
+        counter = QueryCounter()
+        token = current_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_counter.reset(token)
+        self.observe(request, response, counter, time.perf_counter() - start)
+        return response
+
+    async def ahandle(self, request):
+        counter = QueryCounter()
+        token = current_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_counter.reset(token)
+        self.observe(request, response, counter, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def observe(request, response, counter, duration):
+        match = request.resolver_match
+        metrics.observe(
+            view=match.url_name or match.view_name if match else 'unresolved',
+            method=request.method if request.method in METHODS else 'other',
+            status=response.status_code,
+            duration=duration,
+            queries=counter.count,
+            db_time=counter.duration,
+            size=None if response.streaming else len(response.content),
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.9 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('url_name', models.CharField(max_length=200)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=2000)),
+                ('status', models.PositiveSmallIntegerField()),
+                ('duration', models.FloatField(help_text='Durée de la requête profilée, en secondes')),
+                ('user_id', models.IntegerField()),
+                ('file', models.CharField(max_length=255)),
+                ('summary', models.TextField()),
+            ],
+            options={
+                'ordering': ['-created_time'],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import models
+
+
+class Profile(models.Model):
+    """ Profil cProfile d'une requête, demandé par un super-utilisateur (monitoring.profiling).
+        Le fichier .prof est dans PROFILER['DIR'] ; summary garde les fonctions les plus coûteuses.
+    """
+    created_time = models.DateTimeField(auto_now_add=True)
+    url_name = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    status = models.PositiveSmallIntegerField()
+    duration = models.FloatField(help_text="Durée de la requête profilée, en secondes")
+    user_id = models.IntegerField()
+    file = models.CharField(max_length=255)
+    summary = models.TextField()
+
+    class Meta:
+        ordering = ['-created_time']
+
+    def __str__(self):
+        return f"Profile {self.method} {self.url_name} {self.duration * 1000:.0f} ms"
@@ -0,0 +1,137 @@
+import cProfile
+import io
+import pstats
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from core.middleware import HybridMiddleware
+from users.authentication import CachedUserJWTAuthentication
+from .models import Profile
+
+HEADER = 'HTTP_X_PROFILE'
+PARAMETER = 'profile'
+# Valeurs du paramètre qui ne demandent pas de profil (?profile=0)
+DISABLED = ('', '0', 'false', 'no', 'off')
+SUMMARY_LINES = 30
+
+# Profileur de la requête en cours sous ASGI : propagé par asgiref aux threads de sync_to_async
+current_profiler = ContextVar('current_profiler', default=None)
+
+
+def options():
+    return {'DIR': settings.BASE_DIR / 'profiles', 'MAX_FILES': 100, **getattr(settings, 'PROFILER', {})}
+
+
+def requested(request):
+    """ En-tête X-Profile, ou paramètre ?profile= d'une valeur non nulle (?profile=1).
+        La chaîne de requête n'est analysée que si elle contient le nom du paramètre.
+    """
+    if HEADER in request.META:
+        return True
+    if PARAMETER not in request.META.get('QUERY_STRING', ''):
+        return False
+    return request.GET.get(PARAMETER, '').lower() not in DISABLED
+
+
+@contextmanager
+def profiled():
+    """ Active dans le thread courant le profileur de la requête ASGI en cours, s'il y en a un """
+    profiler = current_profiler.get()
+    if profiler is None:
+        yield
+        return
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+
+
+def requesting_superuser(request):
+    """ Super-utilisateur connecté par session (admin) ou par jeton JWT, sinon None """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            authenticated = CachedUserJWTAuthentication().authenticate(request)
+        except APIException:
+            return None
+        user = authenticated[0] if authenticated else None
+    return user if user is not None and user.is_active and user.is_superuser else None
+
+
+def rotate(directory, max_files):
+    """ Garde les max_files profils les plus récents : fichiers et lignes de Profile """
+    for profile in Profile.objects.order_by('-created_time', '-id')[max_files:]:
+        (directory / profile.file).unlink(missing_ok=True)
+        profile.delete()
+
+
+def save(request, response, profiler, duration, user):
+    config = options()
+    directory = Path(config['DIR'])
+    directory.mkdir(parents=True, exist_ok=True)
+    match = request.resolver_match
+    url_name = (match.url_name or match.view_name) if match else 'unresolved'
+    name = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{url_name}-{request.method}-{duration * 1000:.0f}ms.prof"
+    profiler.dump_stats(directory / name)
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    Profile.objects.create(url_name=url_name, method=request.method, path=request.get_full_path()[:2000],
+                           status=response.status_code, duration=duration, user_id=user.id, file=name,
+                           summary=summary.getvalue())
+    rotate(directory, config['MAX_FILES'])
+    return name
+
+
+class ProfilerMiddleware(HybridMiddleware):
+    """ Profilage à la demande d'une requête par cProfile : en-tête X-Profile ou paramètre ?profile=1,
+        pris en compte pour les seuls super-utilisateurs (session ou jeton JWT).
+        - Le profil est écrit dans PROFILER['DIR'], nommé d'après la date, la route, la méthode et la durée,
+          et listé dans l'admin (monitoring.Profile) ; seuls les PROFILER['MAX_FILES'] derniers sont gardés
+        - Sans en-tête ni paramètre, le coût se limite à deux recherches dans request.META,
+          sans changer de thread sous ASGI
+        - cProfile ne voit que le thread qui l'active. Sous ASGI, le profileur est transmis par current_profiler
+          et activé par les vues asynchrones de core/urls_asgi.py (projects/asynchronous.py) dans le thread
+          qui exécute la vue ; les autres vues n'y figurent pas : les profiler par core/wsgi.py
+        - Le contenu des réponses en flux (export) est produit après le profilage et n'y figure pas
+    """
+
+    def handle(self, request):
+        if not requested(request):
+            return self.get_response(request)
+        user = requesting_superuser(request)
+        if user is None:
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        response['X-Profile'] = save(request, response, profiler, time.perf_counter() - start, user)
+        return response
+
+    async def ahandle(self, request):
+        if not requested(request):
+            return await self.get_response(request)
+        user = await sync_to_async(requesting_superuser)(request)
+        if user is None:
+            return await self.get_response(request)
+        profiler = cProfile.Profile()
+        token = current_profiler.set(profiler)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profiler.reset(token)
+        response['X-Profile'] = await sync_to_async(save)(request, response, profiler,
+                                                          time.perf_counter() - start, user)
+        return response
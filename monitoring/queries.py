@@ -0,0 +1,131 @@
+import logging
+import re
+import traceback
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+# Envoyé après chaque requête inspectée, avec request et report (QueryReport)
+query_report = Signal()
+
+DEFAULTS = {'ENABLED': False, 'THRESHOLD': 3, 'BUDGETS': {}}
+# Fichiers de l'inspecteur, exclus des piles d'appels signalées
+INSPECTOR_FILES = {str(Path(__file__).resolve().parent / name) for name in ('queries.py', 'testing.py')}
+
+STRINGS = re.compile(r"'(?:[^']|'')*'")
+NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LISTS = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)', re.IGNORECASE)
+SPACES = re.compile(r'\s+')
+
+
+def options():
+    return {**DEFAULTS, **getattr(settings, 'QUERY_INSPECTOR', {})}
+
+
+def fingerprint(sql):
+    """ Forme normalisée d'une requête : deux requêtes qui ne diffèrent que par leurs paramètres
+        (valeurs littérales, longueur d'une liste IN) ont la même empreinte
+    """
+    sql = STRINGS.sub('?', sql)
+    sql = NUMBERS.sub('?', sql)
+    sql = IN_LISTS.sub('IN (...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def application_stack():
+    """ Pile d'appels réduite au code du projet (hors bibliothèques et hors de l'inspecteur) """
+    base = str(settings.BASE_DIR)
+    frames = [frame for frame in traceback.extract_stack()[:-2]
+              if frame.filename.startswith(base) and 'site-packages' not in frame.filename
+              and frame.filename not in INSPECTOR_FILES]
+    return ''.join(traceback.format_list(frames))
+
+
+class QueryReport:
+    """ Requêtes exécutées pendant une requête HTTP (ou un bloc de code), groupées par empreinte.
+        - repeated : empreintes exécutées au moins `threshold` fois, avec le nombre de requêtes
+          strictement identiques (mêmes paramètres) et la pile d'appels de la première d'entre elles
+        - over_budget : nombre de requêtes supérieur au budget du point d'entrée
+    """
+
+    def __init__(self, threshold, budget=None, name=None):
+        self.threshold = threshold
+        self.budget = budget
+        self.name = name
+        self.count = 0
+        self.fingerprints = Counter()
+        self.identical = Counter()
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        self.count += 1
+        self.fingerprints[key] += 1
+        self.identical[(key, sql, repr(params))] += 1
+        if key not in self.stacks:
+            self.stacks[key] = application_stack()
+        return execute(sql, params, many, context)
+
+    @property
+    def repeated(self):
+        duplicates = Counter()
+        for (key, _, _), count in self.identical.items():
+            duplicates[key] = max(duplicates[key], count)
+        return [{'fingerprint': key, 'count': count, 'identical': duplicates[key], 'stack': self.stacks[key]}
+                for key, count in self.fingerprints.most_common() if count >= self.threshold]
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+    def __bool__(self):
+        """ Vrai si le rapport signale un problème """
+        return self.over_budget or bool(self.repeated)
+
+    def format(self):
+        lines = [f"{self.name or 'Bloc'} : {self.count} requête(s) SQL"
+                 + (f", budget de {self.budget} dépassé" if self.over_budget else '')]
+        for item in self.repeated:
+            lines.append(f"- {item['count']} fois ({item['identical']} identiques) : {item['fingerprint']}")
+            lines.append("  Première exécution :\n" + item['stack'].rstrip())
+        return '\n'.join(lines)
+
+
+def budget_for(budgets, name, method):
+    """ Budget "MÉTHODE nom" (par exemple "GET project-detail"), sinon budget du nom de route """
+    return budgets.get(f'{method} {name}', budgets.get(name))
+
+
+class QueryInspectorMiddleware:
+    """ Inspecteur de requêtes SQL pour le développement et les tests, activé par QUERY_INSPECTOR['ENABLED'] :
+        - signale les requêtes répétées (N+1, doublons) au-delà de THRESHOLD exécutions par requête HTTP
+        - signale les points d'entrée qui dépassent leur budget de requêtes (BUDGETS, par nom de route)
+        Les problèmes sont journalisés (logger monitoring.queries) et chaque rapport est envoyé
+        par le signal query_report (utilisé par QueryInspectionMixin pour faire échouer les tests).
+        Seules les requêtes du thread de la requête sont vues, pas celles des lectures asynchrones de core/asgi.py.
+    """
+
+    def __init__(self, get_response):
+        if not options()['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = options()
+        report = QueryReport(config['THRESHOLD'])
+        with connection.execute_wrapper(report):
+            response = self.get_response(request)
+        match = request.resolver_match
+        report.name = f"{request.method} {match.url_name or match.view_name if match else request.path}"
+        if match:
+            report.budget = budget_for(config['BUDGETS'], match.url_name, request.method)
+        if report:
+            logger.warning(report.format())
+        query_report.send(sender=self.__class__, request=request, report=report)
+        return response
@@ -0,0 +1,11 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .middleware import count_queries
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    """ Chaque connexion compte ses requêtes pour la requête HTTP en cours (MetricsMiddleware) """
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import override_settings
+
+from .queries import QueryReport, options, query_report
+
+
+class QueryInspectionMixin:
+    """ Mixin des tests qui passent par le client de test : chaque requête HTTP est inspectée
+        (QueryInspectorMiddleware) et le test échoue si une requête SQL est répétée au moins
+        `query_threshold` fois ou si un point d'entrée dépasse son budget.
+        - query_budgets : {nom de route ou "MÉTHODE nom": nombre maximal de requêtes}, en plus de
+          QUERY_INSPECTOR['BUDGETS']
+        - query_threshold : seuil de répétition, QUERY_INSPECTOR['THRESHOLD'] par défaut
+    """
+    query_budgets = {}
+    query_threshold = None
+
+    def setUp(self):
+        super().setUp()
+        config = options()
+        inspector = override_settings(QUERY_INSPECTOR={
+            **config, 'ENABLED': True, 'BUDGETS': {**config['BUDGETS'], **self.query_budgets},
+            'THRESHOLD': self.query_threshold or config['THRESHOLD'],
+        })
+        inspector.enable()
+        self.addCleanup(inspector.disable)
+        self.query_reports = []
+        query_report.connect(self.collect_query_report)
+        self.addCleanup(query_report.disconnect, self.collect_query_report)
+        # Exécuté après tearDown : les requêtes de tout le test sont vérifiées
+        self.addCleanup(self.check_query_reports)
+
+    def collect_query_report(self, sender, request, report, **kwargs):
+        self.query_reports.append(report)
+
+    def check_query_reports(self):
+        problems = [report.format() for report in self.query_reports if report]
+        if problems:
+            self.fail('\n\n'.join(problems))
+
+    @contextmanager
+    def assertNoRepeatedQueries(self, threshold=None, budget=None):
+        """ Même contrôle pour un bloc de code exécuté hors du client de test """
+        report = QueryReport(threshold or self.query_threshold or options()['THRESHOLD'], budget=budget)
+        with connection.execute_wrapper(report):
+            yield report
+        if report:
+            self.fail(report.format())
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.test import TransactionTestCase, override_settings
+from django.urls import include, path, reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from contributors import membership
+from contributors.models import Contributor
+from projects.cache import response_cache
+from projects.models import Project
+from users import authentication
+from users.models import User
+from .metrics import Metrics, metrics, render
+from .middleware import MetricsMiddleware
+from .models import Profile
+from .queries import fingerprint
+from .testing import QueryInspectionMixin
+
+
+class MetricsTests(APITestCase):
+
+    def setUp(self):
+        membership.cache.clear()
+        metrics.reset()
+        self.user = User.objects.create_user(email='owner@test.fr', password='secret')
+        self.project = Project.objects.create(title='Projet', description='Description', author_user_id=self.user.id)
+        Contributor.objects.create(project=self.project, user=self.user, role=Contributor.OWNER)
+        Contributor.objects.create(project=self.project, user=self.user, role=Contributor.CONTRIBUTOR)
+        self.client.force_authenticate(self.user)
+
+    def test_requests_recorded_by_url_name(self):
+        self.client.get(reverse('project-detail', args=[self.project.id]))
+        self.client.get(reverse('project-detail', args=[self.project.id]))
+        self.client.get('/inconnu/')
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('http_requests_total{view="project-detail",method="GET",status="200"} 2', text)
+        self.assertIn('http_requests_total{view="unresolved",method="GET",status="404"} 1', text)
+        self.assertIn('http_request_duration_seconds_count{view="project-detail",method="GET"} 2', text)
+        self.assertIn('http_request_queries_bucket{view="project-detail",method="GET",le="+Inf"} 2', text)
+        self.assertNotIn('http_request_queries_bucket{view="project-detail",method="GET",le="0"} 2', text)
+
+    def test_processes_merged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            other = Metrics(directory=directory)
+            other.observe('issue', 'GET', 200, 0.02, 3, 0.001, 512)
+            other.flush()
+            os.rename(other.path, os.path.join(directory, 'metrics-1.json'))
+            local = Metrics(directory=directory)
+            local.observe('issue', 'GET', 200, 0.02, 3, 0.001, 512)
+            histograms, counters = local.collect()
+            self.assertEqual(counters['http_requests_total'][('issue', 'GET', '200')], 2)
+            self.assertEqual(sum(histograms['http_response_size_bytes'][('issue', 'GET')][0]), 2)
+            with open(os.path.join(directory, 'metrics-1.json')) as file:
+                self.assertIn('histograms', json.load(file))
+
+    def test_stale_files_pruned(self):
+        with tempfile.TemporaryDirectory() as directory:
+            process = subprocess.Popen(['true'])
+            process.wait()
+            exited = os.path.join(directory, f'metrics-{process.pid}.json')
+            old = os.path.join(directory, 'metrics-1.json')
+            for path in (exited, old):
+                with open(path, 'w') as file:
+                    json.dump({'counters': {'http_requests_total': [[['issue', 'GET', '200'], 1]]}}, file)
+            os.utime(old, (0, 0))
+            _, counters = Metrics(directory=directory).collect()
+            self.assertEqual(counters['http_requests_total'], {})
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_unknown_methods_grouped(self):
+        self.client.generic('PROPFIND', reverse('project-detail', args=[self.project.id]))
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('http_requests_total{view="project-detail",method="other",status="405"} 1', text)
+        self.assertNotIn('PROPFIND', text)
+
+    def test_async_capable(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(asyncio.iscoroutinefunction(MetricsMiddleware(get_response)))
+        self.assertFalse(asyncio.iscoroutinefunction(MetricsMiddleware(lambda request: HttpResponse())))
+
+    @override_settings(METRICS={'ALLOWED_IPS': ['10.0.0.1']})
+    def test_forbidden_address(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+
+@override_settings(ROOT_URLCONF='core.urls_asgi')
+class AsyncMetricsTests(TransactionTestCase):
+    """ Lectures asynchrones de core/urls_asgi.py, exécutées sur les connexions du pool de threads """
+
+    def setUp(self):
+        membership.cache.clear()
+        response_cache.backend.clear()
+        metrics.reset()
+        self.user = User.objects.create_user(email='owner@test.fr', password='secret')
+        self.project = Project.objects.create(title='Projet', description='Description', author_user_id=self.user.id)
+        Contributor.objects.create(project=self.project, user=self.user, role=Contributor.CONTRIBUTOR)
+
+    async def test_queries_counted_in_thread_pool(self):
+        response = await self.async_client.get(reverse('project-detail', args=[self.project.id]),
+                                               authorization=f'Bearer {AccessToken.for_user(self.user)}')
+        self.assertEqual(response.status_code, 200)
+        text = render(*metrics.collect())
+        self.assertIn('http_request_queries_bucket{view="project-detail",method="GET",le="0"} 0', text)
+        self.assertIn('http_request_queries_count{view="project-detail",method="GET"} 1', text)
+
+
+def n_plus_one(request):
+    emails = [User.objects.filter(pk=user_id).values_list('email', flat=True).first()
+              for user_id in User.objects.values_list('id', flat=True)]
+    return HttpResponse(','.join(emails))
+
+
+urlpatterns = [
+    path('emails/', n_plus_one, name='emails'),
+    path('projects/', include('projects.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF='monitoring.tests')
+class QueryInspectionTests(QueryInspectionMixin, APITestCase):
+    query_budgets = {'GET project-detail': 1}
+
+    def setUp(self):
+        super().setUp()
+        membership.cache.clear()
+        response_cache.backend.clear()
+        self.users = [User.objects.create_user(email=f'user{i}@test.fr', password='secret') for i in range(4)]
+        self.project = Project.objects.create(title='Projet', description='Description',
+                                              author_user_id=self.users[0].id)
+        Contributor.objects.create(project=self.project, user=self.users[0], role=Contributor.CONTRIBUTOR)
+        self.client.force_authenticate(self.users[0])
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'a''b' LIMIT 21"),
+                         fingerprint("SELECT * FROM t WHERE id IN (%s) AND name = 'c' LIMIT 1"))
+
+    def test_repeated_queries(self):
+        with self.assertLogs('monitoring.queries', 'WARNING') as logs:
+            self.client.get('/emails/')
+        report = self.query_reports.pop()
+        self.assertEqual(logs.output, [f'WARNING:monitoring.queries:{report.format()}'])
+        self.assertTrue(report)
+        self.assertEqual(report.repeated[0]['count'], 4)
+        self.assertIn('n_plus_one', report.repeated[0]['stack'])
+
+    def test_budget(self):
+        with self.assertLogs('monitoring.queries', 'WARNING'):
+            self.client.get(reverse('project-detail', args=[self.project.id]))
+        report = self.query_reports.pop()
+        self.assertTrue(report.over_budget)
+        self.assertIn('GET project-detail', report.format())
+
+    def test_block(self):
+        with self.assertRaises(AssertionError):
+            with self.assertNoRepeatedQueries():
+                for user in self.users:
+                    User.objects.filter(pk=user.pk).exists()
+        with self.assertNoRepeatedQueries(budget=1):
+            User.objects.exists()
+
+
+class ProfilerTests(APITestCase):
+
+    def setUp(self):
+        authentication.cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(PROFILER={'DIR': self.directory.name, 'MAX_FILES': 2})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.admin = User.objects.create_superuser(email='admin@test.fr', password='secret')
+        self.user = User.objects.create_user(email='user@test.fr', password='secret')
+
+    def get(self, user, **extra):
+        return self.client.get(reverse('project'), HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}',
+                               **extra)
+
+    def test_superuser_profile(self):
+        response = self.get(self.admin, HTTP_X_PROFILE='1')
+        profile = Profile.objects.get()
+        self.assertEqual(response['X-Profile'], profile.file)
+        self.assertEqual((profile.url_name, profile.method, profile.status), ('project', 'GET', response.status_code))
+        self.assertIn('function calls', profile.summary)
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, profile.file)))
+
+    def test_other_users_ignored(self):
+        response = self.get(self.user, HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile', response)
+        self.get(self.admin)
+        self.assertFalse(Profile.objects.exists())
+
+    def test_parameter_value(self):
+        for query in ['?profile=0', '?profile=', '?user_profile=1', '?search=profile']:
+            self.client.get(reverse('project') + query, HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}')
+        self.assertFalse(Profile.objects.exists())
+
+    def test_rotation(self):
+        for _ in range(3):
+            self.client.get(reverse('project') + '?profile=1',
+                            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}')
+        self.assertEqual(Profile.objects.count(), 2)
+        self.assertEqual(sorted(os.listdir(self.directory.name)),
+                         sorted(Profile.objects.values_list('file', flat=True)))
+
+
+@override_settings(ROOT_URLCONF='core.urls_asgi')
+class AsyncProfilerTests(TransactionTestCase):
+    """ Sous ASGI, le profil couvre le thread du pool où s'exécute la lecture """
+
+    def setUp(self):
+        authentication.cache.clear()
+        membership.cache.clear()
+        response_cache.backend.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(PROFILER={'DIR': self.directory.name, 'MAX_FILES': 2})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.admin = User.objects.create_superuser(email='admin@test.fr', password='secret')
+        self.project = Project.objects.create(title='Projet', description='Description', author_user_id=self.admin.id)
+        Contributor.objects.create(project=self.project, user=self.admin, role=Contributor.CONTRIBUTOR)
+
+    async def test_view_thread_profiled(self):
+        response = await self.async_client.get(reverse('project-detail', args=[self.project.id]),
+                                               authorization=f'Bearer {AccessToken.for_user(self.admin)}',
+                                               x_profile='1')
+        self.assertEqual(response.status_code, 200)
+        profile = await sync_to_async(Profile.objects.get)()
+        self.assertEqual(response['X-Profile'], profile.file)
+        self.assertIn('retrieve', profile.summary)
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .metrics import metrics, render
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics_view(request):
+    """ Mesures de tous les processus au format texte de Prometheus, réservées aux adresses autorisées """
+    allowed = getattr(settings, 'METRICS', {}).get('ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(*metrics.collect()), content_type=CONTENT_TYPE)
@@ -0,0 +1,77 @@
+import tempfile
+from functools import wraps
+from wsgiref.util import FileWrapper
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from core.middleware import atomic_write
+from monitoring.profiling import profiled
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Contenu d'une réponse en flux gardé en mémoire, au-delà écrit dans un fichier temporaire
+SPOOL_SIZE = 1024 * 1024
+SPOOL_BLOCK_SIZE = 64 * 1024
+
+
+def spool(response):
+    """ Produit le contenu d'une réponse en flux dans le thread courant et le remplace par sa copie
+        (en mémoire puis dans un fichier temporaire) : le gestionnaire ASGI de Django 3.2 itère
+        le contenu dans la boucle d'événements, où un générateur qui lit la base échouerait
+        (SynchronousOnlyOperation). Le premier octet n'est envoyé qu'une fois le contenu entièrement produit.
+    """
+    file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    try:
+        for chunk in response.streaming_content:
+            file.write(chunk)
+    except BaseException:
+        file.close()
+        raise
+    file.seek(0)
+    response.streaming_content = FileWrapper(file, SPOOL_BLOCK_SIZE)
+
+
+def run_read(view, request, *args, **kwargs):
+    """ Exécute une lecture dans un thread du pool, avec la connexion à la base de ce thread.
+        La réponse est rendue dans le même thread : la sérialisation JSON ne bloque pas non plus la boucle.
+        Le contenu d'une réponse en flux (export) y est produit de même, voir spool().
+        Une requête profilée (ProfilerMiddleware) l'est dans ce thread.
+    """
+    close_old_connections()
+    try:
+        with profiled():
+            response = view(request, *args, **kwargs)
+            if response.streaming:
+                spool(response)
+            elif callable(getattr(response, 'render', None)):
+                response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def run_write(view, request, *args, **kwargs):
+    """ Exécute une écriture dans une transaction (atomic_write), profilée si elle est demandée """
+    with profiled():
+        return atomic_write(view, request, *args, **kwargs)
+
+
+def async_read(view_class, **initkwargs):
+    """ Version asynchrone d'une vue DRF pour le point d'entrée ASGI (core/asgi.py).
+        Django 3.2 n'a pas d'ORM asynchrone : les lectures (authentification, permissions, requêtes,
+        rendu) s'exécutent en entier dans le pool de threads (thread_sensitive=False) et plusieurs
+        lectures lentes avancent en parallèle sans occuper la boucle d'événements.
+        Les écritures restent sérialisées dans le thread principal, comme pour une vue synchrone sous ASGI,
+        dans une transaction (atomic_write, voir WriteTransactionMiddleware).
+    """
+    view = view_class.as_view(**initkwargs)
+    read = sync_to_async(run_read, thread_sensitive=False)
+    write = sync_to_async(run_write)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await read(view, request, *args, **kwargs)
+        return await write(view, request, *args, **kwargs)
+
+    return async_view
@@ -0,0 +1,234 @@
+import random
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import models
+from django.utils import timezone
+
+from contributors.models import Contributor
+from .models import Project, Issue, Comment
+
+User = get_user_model()
+
+EMAIL = 'bench{}@bench.test'
+WORDS = ('connexion', 'erreur', 'page', 'affichage', 'lenteur', 'export', 'import', 'mot', 'passe', 'compte',
+         'profil', 'recherche', 'filtre', 'tri', 'notification', 'courriel', 'paiement', 'panier', 'commande',
+         'facture', 'tableau', 'graphique', 'rapport', 'cache', 'serveur', 'base', 'requête', 'réponse', 'délai',
+         'bouton', 'formulaire', 'validation', 'date', 'fuseau', 'traduction', 'mobile', 'tablette', 'écran',
+         'menu', 'session', 'jeton', 'droit', 'rôle', 'contributeur', 'projet', 'version', 'mise', 'jour')
+# Répartitions des valeurs des problèmes : (valeur, poids)
+STATUSES = ((Issue.TO_DO, 5), (Issue.IN_PROGRESS, 3), (Issue.ENDED, 2))
+PRIORITIES = ((Issue.LOW_PRIORITY, 5), (Issue.MEDIUM_PRIORITY, 3), (Issue.HIGH_PRIORITY, 1))
+TAGS = ((Issue.BUG, 5), (Issue.IMPROVEMENT, 3), (Issue.TASK, 2))
+TYPES = ((Project.BACK_END, 4), (Project.FRONT_END, 3), (Project.IOS, 1), (Project.ANDROID, 1))
+HISTORY = timedelta(days=365)
+
+
+def zipf_weights(n, exponent=1.1):
+    """ Poids cumulés d'une loi de Zipf : le rang 0 est le plus fréquent """
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+
+def spread(rng, total, cum_weights, size):
+    """ Répartit `total` éléments entre `size` cases selon les poids cumulés """
+    counts = Counter(rng.choices(range(size), cum_weights=cum_weights, k=total))
+    return [counts[i] for i in range(size)]
+
+
+def percentile(values, rank):
+    """ Percentile au rang le plus proche d'une liste triée """
+    return values[min(len(values) - 1, max(0, round(rank / 100 * len(values)) - 1))]
+
+
+def summary(values, ranks=(50, 95, 99)):
+    values = sorted(values)
+    return {**{f'p{rank}': percentile(values, rank) for rank in ranks}, 'max': values[-1]}
+
+
+def create_users(count, password):
+    """ Crée les utilisateurs bench<i>@bench.test manquants, tous avec le même mot de passe (haché une fois) """
+    emails = [EMAIL.format(i) for i in range(count)]
+    existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+    hashed = make_password(password)
+    User.objects.bulk_create([User(email=email, password=hashed) for email in emails if email not in existing],
+                             batch_size=1000)
+    return emails
+
+
+class SyntheticData:
+    """ Jeu de données reproductible (même graine, mêmes données) au format NDJSON de l'export,
+        importé par projects.importer. Les répartitions sont asymétriques, comme en production :
+        - quelques projets concentrent la plupart des problèmes et des contributeurs (loi de Zipf)
+        - quelques utilisateurs possèdent et contribuent à beaucoup de projets
+        - les commentaires se concentrent sur une minorité de problèmes (loi de Pareto)
+        - le responsable et les premiers membres d'un projet écrivent la plupart de ses problèmes
+    """
+
+    def __init__(self, emails, projects, contributors, issues, comments, seed=0):
+        self.rng = random.Random(seed)
+        self.emails = emails
+        self.users_weights = zipf_weights(len(emails))
+        projects_weights = zipf_weights(projects)
+        self.contributors = spread(self.rng, contributors, projects_weights, projects)
+        self.issues = spread(self.rng, issues, projects_weights, projects)
+        self.comments = comments
+        self.now = timezone.now()
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def choice(self, values):
+        return self.rng.choices([value for value, _ in values], weights=[weight for _, weight in values])[0]
+
+    def date(self, start):
+        return start + (self.now - start) * self.rng.random()
+
+    def members(self, owner, count):
+        members = {owner: None}
+        wanted = min(count + 1, len(self.emails))
+        for email in self.rng.choices(self.emails, cum_weights=self.users_weights, k=wanted * 10):
+            if len(members) == wanted:
+                break
+            members.setdefault(email)
+        if len(members) < wanted:
+            # Projet presque aussi grand que la base d'utilisateurs : complété au hasard
+            others = [email for email in self.emails if email not in members]
+            members.update(dict.fromkeys(self.rng.sample(others, wanted - len(members))))
+        return list(members)
+
+    def records(self):
+        """ Lignes à importer, projet par projet : le projet, ses contributeurs, ses problèmes, leurs commentaires """
+        total_issues = sum(self.issues)
+        # Poids de Pareto des problèmes, tirés une fois : les commentaires sont répartis sur tous les problèmes
+        issues_weights = list(accumulate(self.rng.paretovariate(1.2) for _ in range(total_issues)))
+        comments = spread(self.rng, self.comments, issues_weights, total_issues) if total_issues else []
+        issue_id = comment_id = 0
+        for project_id, (nb_contributors, nb_issues) in enumerate(zip(self.contributors, self.issues)):
+            owner = self.rng.choices(self.emails, cum_weights=self.users_weights)[0]
+            created = self.now - HISTORY * self.rng.random()
+            yield {'model': 'project', 'id': project_id, 'title': self.text(2, 5), 'description': self.text(10, 40),
+                   'type': self.choice(TYPES), 'author': owner, 'created_time': created.isoformat()}
+            members = self.members(owner, nb_contributors)
+            authors_weights = zipf_weights(len(members), exponent=1.5)
+            yield {'model': 'contributor', 'project': project_id, 'user': owner, 'role': Contributor.OWNER,
+                   'created_time': created.isoformat()}
+            for email in members:
+                yield {'model': 'contributor', 'project': project_id, 'user': email, 'role': Contributor.CONTRIBUTOR,
+                       'created_time': created.isoformat()}
+            for _ in range(nb_issues):
+                issue_created = self.date(created)
+                yield {'model': 'issue', 'id': issue_id, 'project': project_id, 'title': self.text(3, 8),
+                       'description': self.text(10, 80), 'tag': self.choice(TAGS), 'status': self.choice(STATUSES),
+                       'priority': self.choice(PRIORITIES),
+                       'author': self.rng.choices(members, cum_weights=authors_weights)[0],
+                       'assignee': self.rng.choice(members), 'created_time': issue_created.isoformat()}
+                for _ in range(comments[issue_id]):
+                    yield {'model': 'comment', 'id': comment_id, 'issue': issue_id, 'description': self.text(5, 60),
+                           'author': self.rng.choices(members, cum_weights=authors_weights)[0],
+                           'created_time': self.date(issue_created).isoformat()}
+                    comment_id += 1
+                issue_id += 1
+
+
+def dataset():
+    """ Volume de la base mesurée, joint aux résultats """
+    return {'users': User.objects.count(), 'projects': Project.objects.count(),
+            'contributors': Contributor.objects.count(), 'issues': Issue.objects.count(),
+            'comments': Comment.objects.count()}
+
+
+class Target:
+    """ Objets d'un projet visés par les scénarios : le responsable du projet fait toutes les requêtes,
+        sur un problème et un commentaire dont il est l'auteur quand il y en a
+    """
+
+    def __init__(self, project):
+        self.project = project.id
+        self.owner = User.objects.get(pk=project.author_user_id)
+        issues = Issue.objects.filter(project=project).order_by('-comment_count', 'id')
+        issue = issues.filter(author_user=self.owner).first() or issues.first()
+        self.issue = issue.id if issue else None
+        comments = Comment.objects.filter(issue_id=self.issue).order_by('id')
+        comment = comments.filter(author_user=self.owner).first() or comments.first()
+        self.comment = comment.id if comment else None
+        members = Contributor.objects.filter(project=project).values('user_id')
+        self.member = (Contributor.objects.filter(project=project, role=Contributor.CONTRIBUTOR)
+                       .exclude(user=self.owner).values_list('user_id', flat=True).order_by('id').first())
+        self.outsider = User.objects.exclude(pk__in=members).values_list('id', flat=True).order_by('id').first()
+        self.word = (issue.title if issue else project.title).split()[0]
+
+
+def targets(count, seed=0):
+    """ Le projet qui a le plus de problèmes, et des projets tirés au hasard parmi ceux qui ont des commentaires """
+    projects = Project.objects.filter(issues__comment_count__gt=0).distinct().order_by('id')
+    ids = list(projects.values_list('id', flat=True))
+    largest = (Project.objects.filter(id__in=ids).annotate(n=models.Count('issues')).order_by('-n', 'id')
+               .values_list('id', flat=True).first())
+    rng = random.Random(seed)
+    chosen = [largest] + rng.sample([pk for pk in ids if pk != largest], min(count - 1, len(ids) - 1))
+    return [Target(project) for project in Project.objects.filter(id__in=chosen).order_by('id')]
+
+
+# Scénarios par nom de route de projects/urls.py : (méthode, libellé, fonction cible -> (adresse, données)).
+# Une fonction qui renvoie None saute la cible (par exemple un projet sans autre contributeur).
+SCENARIOS = {
+    'project': [
+        ('GET', 'list', lambda t: ('/projects/', None)),
+        ('POST', 'create', lambda t: ('/projects/', {'title': 'Projet', 'description': 'Mesure', 'type': 'BE'})),
+    ],
+    'project-detail': [
+        ('GET', 'read', lambda t: (f'/projects/{t.project}/', None)),
+        ('GET', 'expand', lambda t: (f'/projects/{t.project}/?expand=issues', None)),
+        ('PUT', 'update', lambda t: (f'/projects/{t.project}/',
+                                     {'title': 'Projet', 'description': 'Mesure', 'type': 'BE'})),
+    ],
+    'issue': [
+        ('GET', 'list', lambda t: (f'/projects/{t.project}/issues/', None)),
+        ('GET', 'filter', lambda t: (f'/projects/{t.project}/issues/?status=TD&ordering=-created_time', None)),
+        ('POST', 'create', lambda t: (f'/projects/{t.project}/issues/',
+                                      {'title': 'Problème', 'description': 'Mesure', 'tag': 'BUG',
+                                       'status': 'TD', 'priority': 'LP'})),
+    ],
+    'issue-bulk': [
+        ('PATCH', 'update', lambda t: (f'/projects/{t.project}/issues/bulk/',
+                                       {'filter': {'status': 'TD'}, 'changes': {'priority': 'HP'}})),
+    ],
+    'issue-detail': [
+        ('GET', 'read', lambda t: t.issue and (f'/projects/{t.project}/issues/{t.issue}/', None)),
+        ('GET', 'expand', lambda t: t.issue and (f'/projects/{t.project}/issues/{t.issue}/?expand=comments', None)),
+        ('PATCH', 'update', lambda t: t.issue and (f'/projects/{t.project}/issues/{t.issue}/', {'status': 'IP'})),
+    ],
+    'comment': [
+        ('GET', 'list', lambda t: t.issue and (f'/projects/{t.project}/issues/{t.issue}/comments/', None)),
+        ('POST', 'create', lambda t: t.issue and (f'/projects/{t.project}/issues/{t.issue}/comments/',
+                                                  {'description': 'Mesure'})),
+    ],
+    'comment-detail': [
+        ('GET', 'read', lambda t: t.comment and (
+            f'/projects/{t.project}/issues/{t.issue}/comments/{t.comment}/', None)),
+        ('PUT', 'update', lambda t: t.comment and (
+            f'/projects/{t.project}/issues/{t.issue}/comments/{t.comment}/', {'description': 'Mesure'})),
+    ],
+    'project-user': [
+        ('GET', 'list', lambda t: (f'/projects/{t.project}/users/', None)),
+        ('POST', 'add', lambda t: t.outsider and (f'/projects/{t.project}/users/', {'user': t.outsider})),
+    ],
+    'project-export': [
+        ('GET', 'export', lambda t: (f'/projects/{t.project}/export/', None)),
+    ],
+    'project-stats': [
+        ('GET', 'read', lambda t: (f'/projects/{t.project}/stats/', None)),
+    ],
+    'project-search': [
+        ('GET', 'search', lambda t: (f'/projects/{t.project}/search/?q={t.word}', None)),
+    ],
+    'project-changes': [
+        ('GET', 'since', lambda t: (f'/projects/{t.project}/changes/?since=0', None)),
+    ],
+    'project-user-delete': [
+        ('DELETE', 'remove', lambda t: t.member and (f'/projects/{t.project}/users/{t.member}/', None)),
+    ],
+}
@@ -0,0 +1,36 @@
+from django.db import connections, transaction
+from django.db.models import sql
+
+
+def bulk_create_with_ids(model, objs):
+    """ bulk_create qui renseigne toujours la clé primaire des objets créés.
+        Django 3.2 ne sait pas récupérer les identifiants d'un INSERT multiple sous SQLite :
+        ils sont relus dans la même transaction. SQLite n'autorise qu'un écrivain à la fois et
+        les clés AUTOINCREMENT sont croissantes, les N dernières clés sont donc celles de nos lignes.
+    """
+    if not objs:
+        return objs
+    with transaction.atomic():
+        model.objects.bulk_create(objs)
+        if objs[0].pk is None:
+            ids = list(model.objects.order_by('-pk').values_list('pk', flat=True)[:len(objs)])
+            for obj, pk in zip(objs, reversed(ids)):
+                obj.pk = pk
+    return objs
+
+
+def update_returning_ids(queryset, **values):
+    """ queryset.update(**values) qui retourne les identifiants des lignes modifiées.
+        Un seul UPDATE ... RETURNING (SQLite 3.35 et plus), que Django 3.2 ne sait pas produire :
+        la requête est compilée par l'ORM et complétée de la clause RETURNING.
+    """
+    query = queryset.query.chain(sql.UpdateQuery)
+    query.add_update_values(values)
+    update, params = query.get_compiler(queryset.db).as_sql()
+    if not update:
+        return []
+    connection = connections[queryset.db]
+    pk = connection.ops.quote_name(queryset.model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{update} RETURNING {pk}', params)
+        return [row[0] for row in cursor.fetchall()]
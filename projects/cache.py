@@ -0,0 +1,99 @@
+import hashlib
+import threading
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from contributors.membership import user_roles
+
+
+class ResponseCache:
+    """ Cache des réponses sérialisées des lectures de projets et de problèmes.
+        - Le stockage est un cache Django (CACHES['responses']) : mémoire locale LRU par défaut,
+          fichiers pour partager le cache entre plusieurs processus
+        - Clé : ressource, projet, identifiant, génération de la ressource, rôle de l'utilisateur et paramètres
+        - Invalider une ressource revient à changer sa génération : toutes ses entrées
+          deviennent inaccessibles et sont évincées à terme par le cache
+    """
+
+    def __init__(self, alias='responses'):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def generation(self, resource, pk):
+        key = f'gen:{resource}:{pk}'
+        generation = self.backend.get(key)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            if not self.backend.add(key, generation, timeout=None):
+                generation = self.backend.get(key, generation)
+        return generation
+
+    def key(self, resource, project, pk, role, query_string):
+        variant = hashlib.md5(query_string.encode()).hexdigest()
+        return f'resp:{resource}:{project}:{pk}:{self.generation(resource, pk)}:{role}:{variant}'
+
+    def get(self, key):
+        data = self.backend.get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, key, data):
+        self.backend.set(key, data)
+
+    def invalidate(self, resource, pk):
+        """ Invalide la ressource immédiatement puis à la validation de la transaction
+            (une autre requête a pu remettre en cache l'état non encore validé)
+        """
+        self.backend.delete(f'gen:{resource}:{pk}')
+        transaction.on_commit(lambda: self.backend.delete(f'gen:{resource}:{pk}'))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+response_cache = ResponseCache()
+
+
+class CachedRetrieveMixin:
+    """ Sert la lecture d'une ressource depuis response_cache.
+        Les permissions sont vérifiées à chaque requête, sur les seuls identifiants de l'objet,
+        et une entrée n'est servie que si l'objet appartient toujours au projet de l'URL
+        (get_version_queryset(), sans nouvelle requête si ConditionalRetrieveMixin l'a déjà lu).
+        Les vues définissent cache_resource, cache_project_kwarg et get_version_queryset().
+    """
+    cache_resource = None
+    cache_project_kwarg = 'id_project'
+
+    def version_exists(self):
+        if getattr(self, 'version_found', False):
+            return True
+        return self.get_version_queryset().exists()
+
+    def retrieve(self, request, *args, **kwargs):
+        project = self.kwargs[self.cache_project_kwarg]
+        roles = user_roles(request, project) or ()
+        key = response_cache.key(self.cache_resource, project, self.kwargs['pk'], ''.join(sorted(roles)),
+                                 request.META.get('QUERY_STRING', ''))
+        data = response_cache.get(key)
+        if data is not None and self.version_exists():
+            self.check_object_permissions(request, self.get_version_queryset().model(pk=self.kwargs['pk']))
+            return Response(data, headers={'X-Cache': 'HIT'})
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response_cache.set(key, response.data)
+            response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,36 @@
+from .models import Change
+
+
+def record(project_id, kind, ids, action):
+    """ Inscrit au journal une modification des objets `ids` (une ligne par objet, en une requête) """
+    Change.objects.bulk_create([Change(project_id=project_id, kind=kind, object_id=pk, action=action)
+                                for pk in ids])
+
+
+def latest_cursor(project_id):
+    return Change.objects.filter(project_id=project_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def changes_since(project_id, since, limit):
+    """ Modifications du projet postérieures au curseur `since`, au plus `limit` lignes du journal.
+        Retourne ({kind: {'updated': ids, 'deleted': ids}}, nouveau curseur, reste-t-il des modifications).
+        Seule la dernière action sur chaque objet compte : un objet créé puis supprimé
+        dans l'intervalle n'apparaît que parmi les suppressions.
+
+        Le curseur est monotone : SQLite n'admet qu'une transaction d'écriture à la fois, les identifiants
+        du journal sont donc attribués dans l'ordre de validation et aucune ligne validée plus tard
+        ne peut prendre un identifiant inférieur à un curseur déjà distribué.
+    """
+    rows = list(Change.objects.filter(project_id=project_id, id__gt=since)
+                .order_by('id').values_list('id', 'kind', 'object_id', 'action')[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    last_action = {}
+    for _, kind, object_id, action in rows:
+        last_action[(kind, object_id)] = action
+    delta = {kind: {'updated': [], 'deleted': []} for kind, _ in Change.KIND_CHOICE}
+    for (kind, object_id), action in last_action.items():
+        delta[kind]['deleted' if action == Change.DELETED else 'updated'].append(object_id)
+    cursor = rows[-1][0] if rows else since
+    return delta, cursor, more
@@ -0,0 +1,42 @@
+import hashlib
+
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class ConditionalRetrieveMixin:
+    """ GET conditionnel (If-None-Match) sur une ressource.
+        - L'ETag est fort : il dérive de updated_time, tenu à jour à chaque écriture de la ressource
+          ou de ses objets imbriqués (projects.signals), et des paramètres de la requête (?fields=, ?expand=)
+        - Son calcul coûte une requête sur la clé primaire ; si le client a déjà cette version,
+          la réponse 304 est renvoyée sans charger l'objet ni appeler les sérialiseurs
+        Les vues peuvent redéfinir get_version_queryset() : la ressource demandée, restreinte à son parent,
+        sans les jointures ni les préchargements de get_queryset().
+    """
+
+    def get_version_queryset(self):
+        """ Par défaut, la ressource demandée dans get_queryset() """
+        return self.get_queryset().filter(pk=self.kwargs['pk'])
+
+    def get_etag(self, request):
+        updated_time = self.get_version_queryset().values_list('updated_time', flat=True).first()
+        # Vu par CachedRetrieveMixin : l'objet appartient à son parent, inutile de le vérifier à nouveau
+        self.version_found = updated_time is not None
+        if updated_time is None:
+            return None
+        variant = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()[:8]
+        return quote_etag(f"{self.kwargs['pk']}-{updated_time.timestamp():.6f}-{variant}")
+
+    def retrieve(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag is None:
+            return super().retrieve(request, *args, **kwargs)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            # Les permissions n'utilisent que les identifiants de l'objet
+            self.check_object_permissions(request, self.get_version_queryset().model(pk=self.kwargs['pk']))
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
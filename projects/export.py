@@ -0,0 +1,78 @@
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+
+from contributors.models import Contributor
+from core.db.base import read_snapshot
+from .models import Project, Issue, Comment
+
+User = get_user_model()
+
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+# Accept-Encoding : le codage gzip (mot entier, comme django.middleware.gzip), sauf s'il est refusé par q=0
+ACCEPTS_GZIP = re.compile(r'\bgzip\b(?!\s*;\s*q=0(?:\.0*)?\s*(?:,|$))')
+
+# Colonnes lues -> clés des lignes exportées. Les utilisateurs sont exportés par leur email.
+PROJECT_FIELDS = {'id': 'id', 'title': 'title', 'description': 'description', 'type': 'type',
+                  'created_time': 'created_time'}
+CONTRIBUTOR_FIELDS = {'user__email': 'user', 'role': 'role', 'created_time': 'created_time'}
+ISSUE_FIELDS = {'id': 'id', 'title': 'title', 'description': 'description', 'tag': 'tag', 'status': 'status',
+                'priority': 'priority', 'author_user__email': 'author', 'assignee_user__email': 'assignee',
+                'created_time': 'created_time'}
+COMMENT_FIELDS = {'id': 'id', 'issue_id': 'issue', 'description': 'description', 'author_user__email': 'author',
+                  'created_time': 'created_time'}
+
+
+def record(model, fields, values, **extra):
+    """ Une ligne NDJSON : le type d'objet (model), les valeurs extra puis les colonnes lues """
+    data = {'model': model, **extra, **dict(zip(fields.values(), values))}
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def accepts_gzip(request):
+    return ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')) is not None
+
+
+def project_records(project_id):
+    """ Lignes NDJSON du projet : le projet, ses contributeurs, ses problèmes puis leurs commentaires.
+        Chaque table est lue par morceaux (iterator) et sans instancier de modèles :
+        la mémoire utilisée ne dépend pas de la taille du projet.
+        Toutes les lectures se font dans un même instantané (read_snapshot) : un problème ou un commentaire
+        créé pendant l'export n'y figure pas à moitié, et le fichier reste importable.
+    """
+    with read_snapshot():
+        project = Project.objects.filter(pk=project_id).values_list(*PROJECT_FIELDS, 'author_user_id').get()
+        author = User.objects.filter(pk=project[-1]).values_list('email', flat=True).first()
+        yield record('project', PROJECT_FIELDS, project, author=author)
+
+        contributors = Contributor.objects.filter(project_id=project_id).order_by('id')
+        for values in contributors.values_list(*CONTRIBUTOR_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+            yield record('contributor', CONTRIBUTOR_FIELDS, values, project=project_id)
+
+        issues = Issue.objects.filter(project_id=project_id).order_by('id')
+        for values in issues.values_list(*ISSUE_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+            yield record('issue', ISSUE_FIELDS, values, project=project_id)
+
+        comments = Comment.objects.filter(issue__project_id=project_id).order_by('id')
+        for values in comments.values_list(*COMMENT_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+            yield record('comment', COMMENT_FIELDS, values)
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """ Regroupe les lignes en blocs d'environ `size` octets : moins d'écritures réseau,
+        et une compression gzip plus efficace (un bloc compressé par élément de la séquence)
+    """
+    buffer, length = [], 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b''.join(buffer)
@@ -0,0 +1,232 @@
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, DateTimeField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from contributors.membership import members_changed
+from contributors.models import Contributor
+from . import changes, stats
+from .bulk import bulk_create_with_ids
+from .cache import response_cache
+from .models import Project, Issue, Comment, Change, ImportRecord
+from .signals import issues_bulk_created
+
+User = get_user_model()
+
+USER_KEYS = ('author', 'assignee', 'user')
+# Sous la limite de 999 paramètres par requête des anciennes versions de SQLite
+DATES_PER_UPDATE = 300
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def insert(model, objs):
+    """ bulk_create_with_ids qui conserve les dates de création du fichier importé.
+        auto_now_add les remplace à l'insertion : elles sont rétablies ensuite par un UPDATE ... CASE
+        par tranche de DATES_PER_UPDATE objets (chaque objet y occupe trois paramètres).
+    """
+    times = [obj.created_time for obj in objs]
+    bulk_create_with_ids(model, objs)
+    for start in range(0, len(objs), DATES_PER_UPDATE):
+        dated = list(zip(objs[start:start + DATES_PER_UPDATE], times[start:start + DATES_PER_UPDATE]))
+        model.objects.filter(pk__in=[obj.pk for obj, _ in dated]).update(created_time=Case(
+            *[When(pk=obj.pk, then=Value(time)) for obj, time in dated], output_field=DateTimeField()))
+        for obj, time in dated:
+            obj.created_time = time
+    return objs
+
+
+class Importer:
+    """ Import d'un fichier NDJSON au format de l'export des projets (projects.export), par lots de lignes.
+        - Chaque lot est importé dans une transaction : bulk_create par type d'objet,
+          utilisateurs résolus par email en une requête
+        - Chaque objet créé est inscrit dans ImportRecord avec son identifiant d'origine :
+          relancer l'import d'une même source reprend là où il s'était arrêté
+        - Les références (projet d'un problème, problème d'un commentaire) sont résolues par lot,
+          dans le lot lui-même puis dans ImportRecord : la mémoire utilisée ne dépend que de la taille du lot
+        - Les dates de création du fichier sont conservées, les valeurs des champs à choix sont vérifiées
+    """
+
+    def __init__(self, source, create_users=False):
+        self.source = source
+        self.create_users = create_users
+        self.created = Counter()
+        self.skipped = 0
+
+    def import_batch(self, records):
+        """ Importe un lot de lignes [(numéro de ligne, objet JSON)] """
+        by_model = defaultdict(list)
+        for number, data in records:
+            by_model[data.get('model')].append((number, data))
+        unknown = set(by_model).difference(['project', 'contributor', 'issue', 'comment'])
+        if unknown:
+            number = next(number for number, data in records if data.get('model') in unknown)
+            raise InvalidRecord(f"Ligne {number} : type d'objet inconnu {sorted(unknown, key=str)}.")
+
+        with transaction.atomic():
+            self.now = timezone.now()
+            self.users = self.resolve_users(records)
+            projects = self.import_projects(by_model['project'])
+            self.import_contributors(by_model['contributor'], projects)
+            issues = self.import_issues(by_model['issue'], projects)
+            self.import_comments(by_model['comment'], issues)
+
+    def resolve_users(self, records):
+        emails = {data[key] for _, data in records for key in USER_KEYS if data.get(key)}
+        users = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+        missing = emails.difference(users)
+        if missing and not self.create_users:
+            raise InvalidRecord(f"Utilisateurs inconnus : {', '.join(sorted(missing)[:10])}"
+                                " (utilisez --create-users pour les créer).")
+        if missing:
+            created = [User(email=email, is_active=False) for email in sorted(missing)]
+            for user in created:
+                user.set_unusable_password()
+            bulk_create_with_ids(User, created)
+            users.update((user.email, user.id) for user in created)
+            self.created['user'] += len(created)
+        return users
+
+    def user(self, number, data, key, required=True):
+        email = data.get(key)
+        if not email:
+            if required:
+                raise InvalidRecord(f"Ligne {number} : champ {key} manquant.")
+            return None
+        return self.users[email]
+
+    def created_time(self, data):
+        return (parse_datetime(data['created_time']) if data.get('created_time') else None) or self.now
+
+    @staticmethod
+    def choice(number, data, model, field, default=None):
+        """ Valeur du champ à choix, ou sa valeur par défaut (celle du modèle) si la ligne ne l'indique pas """
+        model_field = model._meta.get_field(field)
+        value = data.get(field, model_field.default if default is None else default)
+        if value not in dict(model_field.choices):
+            raise InvalidRecord(f"Ligne {number} : valeur {value!r} invalide pour {field}.")
+        return value
+
+    def mapped(self, model, source_ids):
+        """ {identifiant d'origine: identifiant créé} des objets déjà importés depuis cette source """
+        return dict(ImportRecord.objects.filter(source=self.source, model=model, source_id__in=set(source_ids))
+                    .values_list('source_id', 'object_id'))
+
+    def create(self, model, records, build):
+        """ Crée en une requête les objets du lot qui n'ont pas encore été importés.
+            Retourne la correspondance de tous les identifiants d'origine du lot et les objets créés.
+        """
+        ids = self.mapped(model._meta.model_name, [data['id'] for _, data in records])
+        new = []
+        for number, data in records:
+            if data['id'] in ids:
+                self.skipped += 1
+                continue
+            try:
+                new.append((data['id'], build(number, data)))
+            except InvalidRecord:
+                raise
+            except (KeyError, TypeError, ValueError) as error:
+                raise InvalidRecord(f"Ligne {number} : objet invalide ({error}).")
+        insert(model, [obj for _, obj in new])
+        ImportRecord.objects.bulk_create([ImportRecord(source=self.source, model=model._meta.model_name,
+                                                       source_id=source_id, object_id=obj.pk)
+                                          for source_id, obj in new])
+        ids.update((source_id, obj.pk) for source_id, obj in new)
+        self.created[model._meta.model_name] += len(new)
+        return ids, [obj for _, obj in new]
+
+    def reference(self, number, ids, model, source_id):
+        if source_id not in ids:
+            raise InvalidRecord(f"Ligne {number} : {model} {source_id} absent du fichier ou non encore importé.")
+        return ids[source_id]
+
+    def references(self, model, records, key, ids):
+        """ Complète `ids` avec les objets référencés par le lot et importés lors des lots précédents """
+        missing = {data.get(key) for _, data in records}.difference(ids)
+        return {**self.mapped(model, missing), **ids} if missing else ids
+
+    def import_projects(self, records):
+        projects, created = self.create(Project, records, lambda number, data: Project(
+            title=data['title'], description=data['description'], type=self.choice(number, data, Project, 'type'),
+            author_user_id=self.user(number, data, 'author'), created_time=self.created_time(data)))
+        for project in created:
+            stats.create_counters(project.pk)
+        return projects
+
+    def import_contributors(self, records, projects):
+        projects = self.references('project', records, 'project', projects)
+        contributors = []
+        for number, data in records:
+            project_id = self.reference(number, projects, 'projet', data.get('project'))
+            role = self.choice(number, data, Contributor, 'role', Contributor.CONTRIBUTOR)
+            contributors.append(Contributor(project_id=project_id, user_id=self.user(number, data, 'user'), role=role,
+                                            created_time=self.created_time(data)))
+        # Contrainte d'unicité (projet, utilisateur, rôle) : une reprise ne crée pas de doublon,
+        # seules les lignes absentes de la base sont créées (le lot est importé sous le verrou d'écriture)
+        keys = set(Contributor.objects.filter(project_id__in={contributor.project_id for contributor in contributors})
+                   .values_list('project_id', 'user_id', 'role'))
+        new = []
+        for contributor in contributors:
+            key = (contributor.project_id, contributor.user_id, contributor.role)
+            if key not in keys:
+                keys.add(key)
+                new.append(contributor)
+        insert(Contributor, new)
+        self.created['contributor'] += len(new)
+        by_project = defaultdict(list)
+        for contributor in new:
+            by_project[contributor.project_id].append(contributor)
+        for project_id, added in by_project.items():
+            members_changed(project_id, {contributor.user_id for contributor in added})
+            changes.record(project_id, Change.CONTRIBUTOR, [contributor.pk for contributor in added], Change.CREATED)
+            response_cache.invalidate('project', project_id)
+
+    def import_issues(self, records, projects):
+        projects = self.references('project', records, 'project', projects)
+        issues, created = self.create(Issue, records, lambda number, data: Issue(
+            project_id=self.reference(number, projects, 'projet', data.get('project')),
+            title=data['title'], description=data['description'],
+            tag=self.choice(number, data, Issue, 'tag'), status=self.choice(number, data, Issue, 'status'),
+            priority=self.choice(number, data, Issue, 'priority'),
+            author_user_id=self.user(number, data, 'author'),
+            assignee_user_id=self.user(number, data, 'assignee', required=False),
+            created_time=self.created_time(data)))
+        ids_by_project = defaultdict(list)
+        for issue in created:
+            ids_by_project[issue.project_id].append(issue.pk)
+        for project_id, ids in ids_by_project.items():
+            issues_bulk_created.send(sender=Issue, project_id=project_id, ids=ids)
+        return issues
+
+    def import_comments(self, records, issues):
+        issues = self.references('issue', records, 'issue', issues)
+        _, created = self.create(Comment, records, lambda number, data: Comment(
+            issue_id=self.reference(number, issues, 'problème', data.get('issue')),
+            description=data['description'], author_user_id=self.user(number, data, 'author'),
+            created_time=self.created_time(data)))
+        issue_ids = {comment.issue_id for comment in created}
+        if not issue_ids:
+            return
+        # bulk_create n'émet aucun signal : compteurs des problèmes recalculés en une requête, puis ceux du projet,
+        # journal des modifications, dates de modification et cache des réponses (comme signals.py pour un commentaire)
+        comments = Comment.objects.filter(issue=OuterRef('pk')).order_by().values('issue').annotate(n=Count('id'))
+        Issue.objects.filter(id__in=issue_ids).update(comment_count=Coalesce(Subquery(comments.values('n')), 0),
+                                                      updated_time=self.now)
+        projects = dict(Issue.objects.filter(id__in=issue_ids).values_list('id', 'project_id'))
+        by_project = defaultdict(list)
+        for comment in created:
+            by_project[projects[comment.issue_id]].append(comment.pk)
+        for project_id, ids in by_project.items():
+            stats.add(project_id, {stats.COMMENTS: len(ids)})
+            changes.record(project_id, Change.COMMENT, ids, Change.CREATED)
+            response_cache.invalidate('project', project_id)
+        Project.objects.filter(id__in=by_project).update(updated_time=self.now)
+        for issue_id in issue_ids:
+            response_cache.invalidate('issue', issue_id)
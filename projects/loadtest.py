@@ -0,0 +1,301 @@
+import asyncio
+import http.client
+import io
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+
+from contributors.models import Contributor
+from .benchmark import EMAIL, summary
+from .models import Issue
+
+User = get_user_model()
+
+HOST = 'localhost'
+OPERATIONS = ('list_projects', 'read_issue', 'post_comment', 'add_contributor')
+LOCKED = 'database is locked'
+# Catégories de résultat d'une requête
+OK, REJECTED, ERROR, LOCKED_ERROR, NETWORK = 'ok', 'rejected', 'error', 'locked', 'network'
+
+
+def parse_mix(text):
+    """ "list_projects=60,read_issue=30,post_comment=8,add_contributor=2" -> {opération: poids} """
+    mix = {}
+    for item in filter(None, text.split(',')):
+        name, _, weight = item.partition('=')
+        if name not in OPERATIONS:
+            raise ValueError(f"Opération inconnue : {name} (choisir parmi {', '.join(OPERATIONS)}).")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"Poids invalide pour {name} : {weight!r}.")
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Le mélange d'opérations est vide.")
+    return mix
+
+
+def build_plan(users, issues_per_project=20):
+    """ Ce que chaque utilisateur virtuel peut faire, lu une fois en base avant la charge :
+        les projets auxquels il contribue, ceux dont il est responsable et quelques problèmes de chaque projet
+    """
+    emails = [EMAIL.format(i) for i in range(users)]
+    rows = User.objects.filter(email__in=emails, is_active=True).order_by('id').values_list('id', 'email')
+    plan_users = []
+    project_ids = set()
+    for user_id, email in rows:
+        roles = defaultdict(set)
+        for project_id, role in Contributor.objects.filter(user_id=user_id).values_list('project_id', 'role'):
+            roles[role].add(project_id)
+        projects = sorted(roles[Contributor.CONTRIBUTOR])
+        plan_users.append({'id': user_id, 'email': email, 'projects': projects,
+                           'owned': sorted(roles[Contributor.OWNER])})
+        project_ids.update(projects)
+    issues = {project_id: list(Issue.objects.filter(project_id=project_id).order_by('id')
+                               .values_list('id', flat=True)[:issues_per_project])
+              for project_id in project_ids}
+    return {'users': plan_users, 'issues': {str(pk): ids for pk, ids in issues.items() if ids},
+            'user_ids': list(User.objects.order_by('id').values_list('id', flat=True))}
+
+
+class HTTPTransport:
+    """ Serveur lancé à part (runserver, gunicorn, uvicorn...) : une connexion persistante par thread """
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.connection = None
+
+    def request(self, method, path, body, headers):
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.connection.request(method, self.prefix + path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                return response.status, response.read(), None
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+class WSGITransport:
+    """ core/wsgi.py appelé directement, sans réseau """
+
+    def __init__(self):
+        from core.wsgi import application
+        self.application = application
+
+    def request(self, method, path, body, headers):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query, 'SERVER_NAME': HOST,
+            'SERVER_PORT': '80', 'HTTP_HOST': HOST, 'wsgi.input': io.BytesIO(body or b''),
+            'CONTENT_LENGTH': str(len(body or b'')), 'wsgi.url_scheme': 'http', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        }
+        for name, value in headers.items():
+            key = name.upper().replace('-', '_')
+            environ[key if key == 'CONTENT_TYPE' else f'HTTP_{key}'] = value
+        status = []
+        try:
+            content = b''.join(self.application(environ, lambda code, response_headers: status.append(code)))
+        except Exception as error:  # DEBUG_PROPAGATE_EXCEPTIONS : l'erreur du serveur remonte jusqu'ici
+            return 500, b'', str(error)
+        return int(status[0].split()[0]), content, None
+
+    def close(self):
+        connections.close_all()
+
+
+class ASGITransport:
+    """ core/asgi.py appelé directement, avec une boucle d'événements par thread """
+
+    def __init__(self):
+        from core.asgi import application
+        self.application = application
+        self.loop = asyncio.new_event_loop()
+
+    def request(self, method, path, body, headers):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'server': (HOST, 80), 'client': ('127.0.0.1', 50000),
+            'headers': [(b'host', HOST.encode()), (b'content-length', str(len(body or b'')).encode())]
+                       + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body or b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        try:
+            self.loop.run_until_complete(self.application(scope, receive, send))
+        except Exception as error:
+            return 500, b'', str(error)
+        content = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+        return messages[0]['status'], content, None
+
+    def close(self):
+        self.loop.close()
+        connections.close_all()
+
+
+TRANSPORTS = {'wsgi': WSGITransport, 'asgi': ASGITransport}
+
+
+class VirtualUsers:
+    """ Un thread de charge : se connecte (JWT) avec ses utilisateurs, puis enchaîne les opérations du mélange.
+        Chaque requête est enregistrée : (instant, opération, statut, secondes, catégorie).
+    """
+
+    def __init__(self, transport, plan, users, mix, password, seed):
+        self.transport = transport
+        self.plan = plan
+        self.users = list(users)
+        self.operations = list(mix)
+        self.weights = list(mix.values())
+        self.password = password
+        self.rng = random.Random(seed)
+        self.tokens = {}
+        self.records = []
+
+    def call(self, operation, method, path, data=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        body = json.dumps(data).encode() if data is not None else None
+        start = time.perf_counter()
+        try:
+            status, content, error = self.transport.request(method, path, body, headers)
+        except (http.client.HTTPException, OSError) as network_error:
+            status, content, error = 0, b'', str(network_error)
+        elapsed = time.perf_counter() - start
+        if status == 0:
+            kind = NETWORK
+        elif LOCKED in (error or '') or (status >= 500 and LOCKED.encode() in content):
+            kind = LOCKED_ERROR
+        elif status >= 500:
+            kind = ERROR
+        elif status >= 400:
+            kind = REJECTED
+        else:
+            kind = OK
+        self.records.append((time.time(), operation, status, elapsed, kind))
+        return status, content
+
+    def login(self, user):
+        """ Jeton d'accès de l'utilisateur. Un utilisateur refusé (identifiants, 400 ou 401)
+            est retiré de la charge ; après un autre échec (erreur du serveur, base verrouillée, réseau),
+            sa prochaine opération se reconnecte.
+        """
+        status, content = self.call('login', 'POST', '/login/', {'email': user['email'], 'password': self.password})
+        self.tokens[user['id']] = json.loads(content)['access'] if status == 200 else None
+        if status in (400, 401):
+            self.users.remove(user)
+        return self.tokens[user['id']]
+
+    def request(self, user, operation, method, path, data=None):
+        token = self.tokens.get(user['id']) or self.login(user)
+        if token is None:
+            return
+        status, _ = self.call(operation, method, path, data, token)
+        if status == 401:
+            # Jeton expiré (5 minutes) : nouvelle connexion, comme le ferait un client
+            self.tokens[user['id']] = None
+
+    def step(self):
+        user = self.rng.choice(self.users)
+        operation = self.rng.choices(self.operations, weights=self.weights)[0]
+        projects = [pk for pk in user['projects'] if str(pk) in self.plan['issues']]
+        if operation == 'add_contributor' and user['owned']:
+            project = self.rng.choice(user['owned'])
+            self.request(user, operation, 'POST', f'/projects/{project}/users/',
+                         {'user': self.rng.choice(self.plan['user_ids'])})
+        elif operation in ('read_issue', 'post_comment') and projects:
+            project = self.rng.choice(projects)
+            issue = self.rng.choice(self.plan['issues'][str(project)])
+            if operation == 'read_issue':
+                self.request(user, operation, 'GET', f'/projects/{project}/issues/{issue}/')
+            else:
+                self.request(user, operation, 'POST', f'/projects/{project}/issues/{issue}/comments/',
+                             {'description': 'Commentaire de charge'})
+        else:
+            # Opération impossible pour cet utilisateur (aucun projet dont il est responsable) : liste des projets
+            self.request(user, 'list_projects', 'GET', '/projects/')
+
+    def run(self, deadline, requests):
+        try:
+            for user in list(self.users):
+                self.login(user)
+            count = 0
+            while self.users and time.time() < deadline and (not requests or count < requests):
+                self.step()
+                count += 1
+        finally:
+            self.transport.close()
+
+
+def run_process(options):
+    """ Un processus de charge : `threads` threads, chacun avec sa part des utilisateurs du plan.
+        Exécuté dans le processus principal ou dans un processus fils (multiprocessing, fork).
+    """
+    plan = options['plan']
+    index, threads = options['index'], options['threads']
+    slots = [plan['users'][i::threads * options['processes']]
+             for i in range(index * threads, (index + 1) * threads)]
+    workers = []
+    for slot, users in enumerate(slots):
+        if not users:
+            continue
+        transport = HTTPTransport(options['url']) if options['url'] else TRANSPORTS[options['app']]()
+        workers.append(VirtualUsers(transport, plan, users, options['mix'], options['password'],
+                                    seed=f"{options['seed']}-{index}-{slot}"))
+    pool = [threading.Thread(target=worker.run, args=(options['deadline'], options['requests']))
+            for worker in workers]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return [record for worker in workers for record in worker.records]
+
+
+def report(records, start, interval):
+    """ Synthèse par opération et évolution par intervalle de temps """
+    def stats(rows, elapsed):
+        kinds = defaultdict(int)
+        for row in rows:
+            kinds[row[4]] += 1
+        latencies = summary([row[3] * 1000 for row in rows]) if rows else {}
+        return {'requests': len(rows), 'throughput': round(len(rows) / elapsed, 1) if elapsed else None,
+                **{kind: kinds[kind] for kind in (OK, REJECTED, ERROR, LOCKED_ERROR, NETWORK)},
+                'latency_ms': {key: round(value, 1) for key, value in latencies.items()}}
+
+    duration = max((row[0] for row in records), default=start) - start
+    by_operation = defaultdict(list)
+    by_interval = defaultdict(list)
+    for row in records:
+        by_operation[row[1]].append(row)
+        by_interval[int((row[0] - start) // interval)].append(row)
+    return {
+        'duration': round(duration, 1),
+        'total': stats(records, duration),
+        'operations': {operation: stats(rows, duration) for operation, rows in sorted(by_operation.items())},
+        'timeline': [{'start': slot * interval, **stats(by_interval[slot], interval)}
+                     for slot in range(max(by_interval, default=-1) + 1)],
+    }
@@ -0,0 +1,109 @@
+import json
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from projects import benchmark
+from projects.cache import response_cache
+from projects.urls import urlpatterns
+
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE SAVEPOINT')
+
+
+class Command(BaseCommand):
+    help = ("Mesure chaque route de projects/urls.py avec le client de test (sans réseau) et écrit en JSON "
+            "les percentiles de latence, le nombre de requêtes SQL et la taille des réponses. "
+            "Les écritures sont annulées après chaque requête : la base mesurée n'est pas modifiée "
+            "(à utiliser sur une base générée par seed_benchmark).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help="Requêtes mesurées par scénario")
+        parser.add_argument('--warmup', type=int, default=5, help="Requêtes non mesurées avant chaque scénario")
+        parser.add_argument('--targets', type=int, default=10, help="Nombre de projets visés")
+        parser.add_argument('--seed', type=int, default=0, help="Graine du tirage des projets visés")
+        parser.add_argument('--routes', nargs='*', help="Routes à mesurer (toutes par défaut)")
+        parser.add_argument('--no-cache', action='store_true',
+                            help="Vide le cache des réponses avant chaque requête")
+        parser.add_argument('--output', help="Fichier de résultats (sortie standard par défaut)")
+
+    def handle(self, *args, **options):
+        names = [pattern.name for pattern in urlpatterns]
+        unknown = set(options['routes'] or ()).difference(names)
+        if unknown:
+            raise CommandError(f"Routes inconnues : {', '.join(sorted(unknown))}.")
+        targets = benchmark.targets(options['targets'], seed=options['seed'])
+        if not targets:
+            raise CommandError("Aucun projet avec des commentaires : lancez d'abord seed_benchmark.")
+        self.client = APIClient()
+        self.tokens = {}
+        self.no_cache = options['no_cache']
+
+        results = {}
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            for name in options['routes'] or names:
+                for method, label, build in benchmark.SCENARIOS.get(name, ()):
+                    requests = [(target, build(target)) for target in targets]
+                    requests = [(target, request) for target, request in requests if request]
+                    if not requests:
+                        continue
+                    for i in range(options['warmup']):
+                        self.call(method, *requests[i % len(requests)])
+                    measures = [self.call(method, *requests[i % len(requests)]) for i in range(options['requests'])]
+                    results[f'{name} {method} {label}'] = self.report(name, method, measures)
+
+        output = json.dumps({
+            'dataset': benchmark.dataset(),
+            'options': {key: options[key] for key in ('requests', 'warmup', 'targets', 'seed', 'no_cache')},
+            'routes': results,
+            'skipped': sorted(set(options['routes'] or names).difference(result['route']
+                                                                          for result in results.values())),
+        }, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def authorization(self, user):
+        if user.id not in self.tokens:
+            self.tokens[user.id] = f'Bearer {AccessToken.for_user(user)}'
+        return self.tokens[user.id]
+
+    def call(self, method, target, request):
+        """ Une requête mesurée : (statut, secondes, requêtes SQL, octets) """
+        path, data = request
+        if self.no_cache:
+            response_cache.backend.clear()
+        write = method not in ('GET', 'HEAD', 'OPTIONS')
+        with CaptureQueriesContext(connection) as queries, transaction.atomic() if write else nullcontext():
+            start = time.perf_counter()
+            response = self.client.generic(method, path, json.dumps(data) if data is not None else '',
+                                           content_type='application/json',
+                                           HTTP_AUTHORIZATION=self.authorization(target.owner))
+            size = (sum(len(chunk) for chunk in response.streaming_content) if response.streaming
+                    else len(response.content))
+            elapsed = time.perf_counter() - start
+            if write:
+                transaction.set_rollback(True)
+        count = sum(1 for query in queries.captured_queries if not query['sql'].startswith(TRANSACTION_STATEMENTS))
+        return response.status_code, elapsed, count, size
+
+    def report(self, name, method, measures):
+        statuses = {}
+        for code, _, _, _ in measures:
+            statuses[str(code)] = statuses.get(str(code), 0) + 1
+        latencies = benchmark.summary([elapsed * 1000 for _, elapsed, _, _ in measures])
+        return {
+            'route': name,
+            'method': method,
+            'requests': len(measures),
+            'status': statuses,
+            'latency_ms': {key: round(value, 2) for key, value in latencies.items()},
+            'queries': benchmark.summary([count for _, _, count, _ in measures]),
+            'bytes': benchmark.summary([size for _, _, _, size in measures], ranks=(50,)),
+        }
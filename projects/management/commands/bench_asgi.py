@@ -0,0 +1,93 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+HOST = 'localhost'
+
+
+class Command(BaseCommand):
+    help = ("Compare le débit des lectures servies par core/wsgi.py (serveur à threads simulé) "
+            "et par core/asgi.py (vues asynchrones), sous une même concurrence, sans passer par le réseau")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Adresses à lire, par exemple /projects/1/issues/")
+        parser.add_argument('--user', required=True, help="Email de l'utilisateur au nom duquel lire")
+        parser.add_argument('--requests', type=int, default=500, help="Nombre de requêtes par point d'entrée")
+        parser.add_argument('--concurrency', type=int, default=20, help="Requêtes simultanées")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f"L'utilisateur {options['user']} n'existe pas.")
+        self.authorization = f'Bearer {AccessToken.for_user(user)}'
+        paths = [options['paths'][i % len(options['paths'])] for i in range(options['requests'])]
+
+        from core.asgi import application as asgi_application
+        from core.wsgi import application as wsgi_application
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=[HOST]):
+            for name, run in [('WSGI', lambda: self.run_wsgi(wsgi_application, paths, options['concurrency'])),
+                              ('ASGI', lambda: asyncio.run(self.run_asgi(asgi_application, paths,
+                                                                         options['concurrency'])))]:
+                start = time.perf_counter()
+                results = run()
+                self.report(name, results, time.perf_counter() - start)
+
+    def run_wsgi(self, application, paths, concurrency):
+        def call(path):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': HOST,
+                'SERVER_PORT': '80', 'HTTP_HOST': HOST, 'HTTP_AUTHORIZATION': self.authorization,
+                'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            }
+            status = []
+            start = time.perf_counter()
+            body = b''.join(application(environ, lambda code, headers: status.append(code)))
+            return int(status[0].split()[0]), time.perf_counter() - start, len(body)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(call, paths))
+
+    async def run_asgi(self, application, paths, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(path):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+                'headers': [(b'host', HOST.encode()), (b'authorization', self.authorization.encode())],
+                'server': (HOST, 80), 'client': ('127.0.0.1', 50000),
+            }
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            async with semaphore:
+                start = time.perf_counter()
+                await application(scope, receive, send)
+                elapsed = time.perf_counter() - start
+            body = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+            return messages[0]['status'], elapsed, len(body)
+
+        return await asyncio.gather(*(call(path) for path in paths))
+
+    def report(self, name, results, elapsed):
+        latencies = sorted(latency for _, latency, _ in results)
+        errors = sum(1 for code, _, _ in results if code >= 400)
+        self.stdout.write(
+            f"{name} : {len(results) / elapsed:.0f} requêtes/s, "
+            f"latence médiane {statistics.median(latencies) * 1000:.1f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, "
+            f"{errors} erreur(s)")
@@ -0,0 +1,69 @@
+import gzip
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.importer import Importer, InvalidRecord
+
+
+class Command(BaseCommand):
+    help = ("Importe des projets depuis un fichier NDJSON au format de l'export (/projects/<id>/export/). "
+            "L'import est repris là où il s'était arrêté si on le relance sur la même source.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path',
+                            help="Fichier NDJSON, éventuellement compressé (.gz), ou - pour l'entrée standard")
+        parser.add_argument('--source', help="Nom de la source pour la reprise (par défaut le nom du fichier)")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Nombre de lignes par transaction")
+        parser.add_argument('--create-users', action='store_true',
+                            help="Crée (inactifs) les utilisateurs inconnus au lieu d'interrompre l'import")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        source = options['source'] or os.path.basename(path)
+        if path == '-' and not options['source']:
+            raise CommandError("Indiquez --source pour importer depuis l'entrée standard.")
+        importer = Importer(source, create_users=options['create_users'])
+
+        start = time.monotonic()
+        number = 0
+        with self.open(path) as lines:
+            numbered = enumerate(lines, start=1)
+            while True:
+                batch = list(islice(numbered, options['batch_size']))
+                if not batch:
+                    break
+                records = []
+                for number, line in batch:
+                    if line.strip():
+                        try:
+                            records.append((number, json.loads(line)))
+                        except ValueError:
+                            raise CommandError(f"Ligne {number} : JSON invalide.")
+                try:
+                    importer.import_batch(records)
+                except InvalidRecord as error:
+                    raise CommandError(f"{error} Les lots précédents sont importés : relancez la commande "
+                                       "après correction pour reprendre.")
+                self.progress(number, importer, start)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Import terminé : {number} lignes, {sum(importer.created.values())} objets créés "
+            f"({', '.join(f'{model} {count}' for model, count in sorted(importer.created.items())) or 'aucun'}), "
+            f"{importer.skipped} déjà importés."))
+
+    def open(self, path):
+        if path == '-':
+            return open(sys.stdin.fileno(), encoding='utf-8', closefd=False)
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8')
+        return open(path, encoding='utf-8')
+
+    def progress(self, number, importer, start):
+        elapsed = time.monotonic() - start
+        self.stdout.write(f"{number} lignes lues, {sum(importer.created.values())} objets créés, "
+                          f"{importer.skipped} déjà importés - {number / elapsed if elapsed else 0:.0f} lignes/s")
@@ -0,0 +1,93 @@
+import json
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+
+from projects import loadtest
+
+DEFAULT_MIX = 'list_projects=40,read_issue=40,post_comment=15,add_contributor=5'
+
+
+class Command(BaseCommand):
+    help = ("Charge concurrente : connecte des utilisateurs générés par seed_benchmark (connexion JWT sur /login/) "
+            "puis rejoue un mélange de lectures et d'écritures depuis plusieurs threads ou processus, "
+            "contre un serveur lancé à part (--url) ou contre core/wsgi.py ou core/asgi.py appelés directement. "
+            "Affiche le débit, les erreurs (dont « database is locked ») et les percentiles de latence "
+            "par opération et par intervalle de temps. "
+            "Les écritures sont conservées : à utiliser sur une base de mesure.")
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument('--url', help="Adresse d'un serveur lancé à part, par exemple http://127.0.0.1:8000")
+        target.add_argument('--app', choices=sorted(loadtest.TRANSPORTS), default='wsgi',
+                            help="Application appelée directement, sans réseau, si --url n'est pas indiqué")
+        parser.add_argument('--users', type=int, default=100, help="Utilisateurs bench<i>@bench.test connectés")
+        parser.add_argument('--password', default='benchmark', help="Mot de passe donné par seed_benchmark")
+        parser.add_argument('--threads', type=int, default=8, help="Threads par processus")
+        parser.add_argument('--processes', type=int, default=1, help="Processus de charge")
+        parser.add_argument('--duration', type=float, default=30, help="Durée de la charge en secondes")
+        parser.add_argument('--requests', type=int, default=0,
+                            help="Nombre maximal de requêtes par thread (0 : jusqu'à la fin de --duration)")
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f"Poids des opérations ({', '.join(loadtest.OPERATIONS)}), par défaut {DEFAULT_MIX}")
+        parser.add_argument('--interval', type=float, default=5, help="Durée des intervalles du suivi, en secondes")
+        parser.add_argument('--seed', type=int, default=0, help="Graine des tirages des utilisateurs virtuels")
+        parser.add_argument('--output', help="Écrit aussi le rapport complet en JSON dans ce fichier")
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error)
+        if options['threads'] < 1 or options['processes'] < 1:
+            raise CommandError("Il faut au moins un thread et un processus.")
+        plan = loadtest.build_plan(options['users'])
+        if not plan['users']:
+            raise CommandError("Aucun utilisateur bench<i>@bench.test actif : lancez d'abord seed_benchmark.")
+
+        start = time.time()
+        settings = {'url': options['url'], 'app': options['app'], 'plan': plan, 'mix': mix,
+                    'password': options['password'], 'threads': options['threads'],
+                    'processes': options['processes'], 'seed': options['seed'],
+                    'deadline': start + options['duration'], 'requests': options['requests']}
+        # Application appelée directement : les erreurs du serveur remontent avec leur message
+        with override_settings(DEBUG=False, DEBUG_PROPAGATE_EXCEPTIONS=True, ALLOWED_HOSTS=[loadtest.HOST]):
+            if options['processes'] == 1:
+                records = loadtest.run_process({**settings, 'index': 0})
+            else:
+                # Les processus fils ouvrent leurs propres connexions à la base
+                connections.close_all()
+                context = multiprocessing.get_context('fork')
+                with context.Pool(options['processes']) as pool:
+                    results = pool.map(loadtest.run_process,
+                                       [{**settings, 'index': index} for index in range(options['processes'])])
+                records = [record for result in results for record in result]
+
+        result = loadtest.report(records, start, options['interval'])
+        self.print_report(result, options['interval'])
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(result, file, indent=2)
+
+    def print_report(self, result, interval):
+        header = (f"{'':>16} {'requêtes':>9} {'req/s':>8} {'rejets':>7} {'erreurs':>8} {'verrou':>7} "
+                  f"{'réseau':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+        def line(label, stats):
+            latency = stats['latency_ms']
+            return (f"{label:>16} {stats['requests']:>9} {stats['throughput'] or 0:>8.1f} {stats['rejected']:>7} "
+                    f"{stats['error']:>8} {stats['locked']:>7} {stats['network']:>7} "
+                    f"{latency.get('p50', 0):>8.1f} {latency.get('p95', 0):>8.1f} {latency.get('p99', 0):>8.1f}")
+
+        self.stdout.write(f"Évolution par intervalle de {interval:g} s")
+        self.stdout.write(header)
+        for slot in result['timeline']:
+            self.stdout.write(line(f"{slot['start']:g} s", slot))
+        self.stdout.write(f"\nSynthèse sur {result['duration']:g} s")
+        self.stdout.write(header)
+        for operation, stats in result['operations'].items():
+            self.stdout.write(line(operation, stats))
+        self.stdout.write(line('total', result['total']))
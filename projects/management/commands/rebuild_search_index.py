@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects import search
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des problèmes et des commentaires"
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError("La recherche plein texte n'est disponible qu'avec SQLite.")
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS("Index de recherche reconstruit."))
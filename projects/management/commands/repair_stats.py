@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from projects import stats
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques des projets et corrige les compteurs qui ont dérivé"
+
+    def add_arguments(self, parser):
+        parser.add_argument('projects', nargs='*', type=int, help="Identifiants des projets (tous par défaut)")
+
+    def handle(self, *args, **options):
+        projects = options['projects'] or Project.objects.order_by('id').values_list('id', flat=True)
+        repaired = 0
+        for project_id in projects:
+            drift = stats.recount(project_id)
+            for key, (counter, real) in sorted(drift.items()):
+                self.stdout.write(f"Projet {project_id} - {key} : {counter} -> {real}")
+            repaired += bool(drift)
+        self.stdout.write(self.style.SUCCESS(f"{repaired} projet(s) corrigé(s)."))
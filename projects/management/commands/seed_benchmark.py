@@ -0,0 +1,48 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.benchmark import SyntheticData, create_users
+from projects.importer import Importer
+
+
+class Command(BaseCommand):
+    help = ("Génère un jeu de données de mesure reproductible : utilisateurs bench<i>@bench.test, projets, "
+            "contributeurs, problèmes et commentaires répartis de façon asymétrique. "
+            "Relancée avec la même graine, la commande reprend ou complète le même jeu de données.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--projects', type=int, default=200)
+        parser.add_argument('--contributors', type=int, default=5000,
+                            help="Contributeurs en plus des responsables, répartis entre les projets")
+        parser.add_argument('--issues', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--seed', type=int, default=0, help="Graine du générateur aléatoire")
+        parser.add_argument('--password', default='benchmark', help="Mot de passe de tous les utilisateurs générés")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Nombre de lignes par transaction")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['projects'] < 1:
+            raise CommandError("Il faut au moins un utilisateur et un projet.")
+        start = time.monotonic()
+        emails = create_users(options['users'], options['password'])
+        data = SyntheticData(emails, options['projects'], options['contributors'], options['issues'],
+                             options['comments'], seed=options['seed'])
+        importer = Importer(f"seed-{options['seed']}")
+        records = enumerate(data.records(), start=1)
+        number = 0
+        while True:
+            batch = list(islice(records, options['batch_size']))
+            if not batch:
+                break
+            number = batch[-1][0]
+            importer.import_batch(batch)
+            self.stdout.write(f"{number} lignes générées, {sum(importer.created.values())} objets créés, "
+                              f"{importer.skipped} déjà présents")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Jeu de données prêt en {time.monotonic() - start:.0f} s : {len(emails)} utilisateurs, "
+            f"{', '.join(f'{model} {count}' for model, count in sorted(importer.created.items())) or 'aucun'} "
+            f"créés, {importer.skipped} déjà présents."))
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.9 on 2026-10-18 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_updated_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_id', models.IntegerField()),
+                ('kind', models.CharField(choices=[('issue', 'Problème'), ('comment', 'Commentaire'), ('contributor', 'Contributeur')], max_length=11)),
+                ('object_id', models.IntegerField()),
+                ('action', models.CharField(choices=[('C', 'Création'), ('U', 'Modification'), ('D', 'Suppression')], max_length=1)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['project_id', 'id'], name='change_project_idx'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 3.2.9 on 2026-10-18 11:20
+
+from django.db import migrations
+
+# Index plein texte FTS5 des problèmes (rowid = 2 * id) et des commentaires (rowid = 2 * id + 1).
+# La colonne project contient le jeton « p<id> » : le filtre par projet est résolu par l'index lui-même.
+# Des triggers le tiennent à jour, y compris pour bulk_create et les UPDATE en masse.
+# SQLite reconstruit une table pour la plupart des modifications de schéma : une migration qui modifie
+# projects_issue ou projects_comment doit supprimer les triggers (DROP_TRIGGERS_SQL)
+# puis les recréer (TRIGGERS_SQL).
+TABLE_SQL = [
+    """CREATE VIRTUAL TABLE projects_search USING fts5(
+        title, body, project, kind UNINDEXED, issue_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+]
+
+TRIGGERS_SQL = [
+    """CREATE TRIGGER projects_search_issue_insert AFTER INSERT ON projects_issue BEGIN
+        INSERT INTO projects_search (rowid, title, body, project, kind, issue_id)
+        VALUES (2 * new.id, new.title, new.description, 'p' || new.project_id, 'issue', new.id);
+    END""",
+    """CREATE TRIGGER projects_search_issue_update AFTER UPDATE OF title, description, project_id ON projects_issue
+    BEGIN
+        DELETE FROM projects_search WHERE rowid = 2 * old.id;
+        INSERT INTO projects_search (rowid, title, body, project, kind, issue_id)
+        VALUES (2 * new.id, new.title, new.description, 'p' || new.project_id, 'issue', new.id);
+    END""",
+    """CREATE TRIGGER projects_search_issue_delete AFTER DELETE ON projects_issue BEGIN
+        DELETE FROM projects_search WHERE rowid = 2 * old.id;
+    END""",
+    """CREATE TRIGGER projects_search_comment_insert AFTER INSERT ON projects_comment BEGIN
+        INSERT INTO projects_search (rowid, title, body, project, kind, issue_id)
+        SELECT 2 * new.id + 1, '', new.description, 'p' || project_id, 'comment', new.issue_id
+        FROM projects_issue WHERE id = new.issue_id;
+    END""",
+    """CREATE TRIGGER projects_search_comment_update AFTER UPDATE OF description, issue_id ON projects_comment BEGIN
+        DELETE FROM projects_search WHERE rowid = 2 * old.id + 1;
+        INSERT INTO projects_search (rowid, title, body, project, kind, issue_id)
+        SELECT 2 * new.id + 1, '', new.description, 'p' || project_id, 'comment', new.issue_id
+        FROM projects_issue WHERE id = new.issue_id;
+    END""",
+    """CREATE TRIGGER projects_search_comment_delete AFTER DELETE ON projects_comment BEGIN
+        DELETE FROM projects_search WHERE rowid = 2 * old.id + 1;
+    END""",
+]
+
+POPULATE_SQL = [
+    """INSERT INTO projects_search (rowid, title, body, project, kind, issue_id)
+       SELECT 2 * id, title, description, 'p' || project_id, 'issue', id FROM projects_issue""",
+    """INSERT INTO projects_search (rowid, title, body, project, kind, issue_id)
+       SELECT 2 * c.id + 1, '', c.description, 'p' || i.project_id, 'comment', c.issue_id
+       FROM projects_comment c JOIN projects_issue i ON i.id = c.issue_id""",
+]
+
+DROP_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS projects_search_comment_delete",
+    "DROP TRIGGER IF EXISTS projects_search_comment_update",
+    "DROP TRIGGER IF EXISTS projects_search_comment_insert",
+    "DROP TRIGGER IF EXISTS projects_search_issue_delete",
+    "DROP TRIGGER IF EXISTS projects_search_issue_update",
+    "DROP TRIGGER IF EXISTS projects_search_issue_insert",
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_change'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(TABLE_SQL + TRIGGERS_SQL + POPULATE_SQL),
+                             run_sqlite(DROP_TRIGGERS_SQL + ["DROP TABLE IF EXISTS projects_search"])),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.9 on 2026-10-18 19:39
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+search_index = import_module('projects.migrations.0008_search_index')
+
+
+def populate_stats(apps, schema_editor):
+    """ Compteurs initiaux des projets existants """
+    Issue = apps.get_model('projects', 'Issue')
+    Comment = apps.get_model('projects', 'Comment')
+    ProjectStat = apps.get_model('projects', 'ProjectStat')
+
+    comments = Comment.objects.filter(issue=OuterRef('pk')).order_by().values('issue').annotate(n=Count('id'))
+    Issue.objects.update(comment_count=Coalesce(Subquery(comments.values('n')), 0))
+
+    counters = {}
+    for field in ('status', 'priority', 'tag'):
+        for project_id, value, count in (Issue.objects.order_by().values_list('project_id', field)
+                                         .annotate(count=Count('id'))):
+            counters[(project_id, f'{field}:{value}')] = count
+    for project_id, count in Issue.objects.order_by().values_list('project_id').annotate(count=Count('id')):
+        counters[(project_id, 'issues')] = count
+    for project_id, count in (Comment.objects.order_by().values_list('issue__project_id')
+                              .annotate(count=Count('id'))):
+        counters[(project_id, 'comments')] = count
+    ProjectStat.objects.bulk_create([ProjectStat(project_id=project_id, key=key, count=count)
+                                     for (project_id, key), count in counters.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_issue_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_id', models.IntegerField()),
+                ('key', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(search_index.run_sqlite(search_index.DROP_TRIGGERS_SQL),
+                             search_index.run_sqlite(search_index.TRIGGERS_SQL)),
+        migrations.AddField(
+            model_name='issue',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(search_index.run_sqlite(search_index.TRIGGERS_SQL),
+                             search_index.run_sqlite(search_index.DROP_TRIGGERS_SQL)),
+        migrations.AddConstraint(
+            model_name='projectstat',
+            constraint=models.UniqueConstraint(fields=('project_id', 'key'), name='unique_project_stat'),
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.9 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=200)),
+                ('model', models.CharField(max_length=11)),
+                ('source_id', models.IntegerField()),
+                ('object_id', models.IntegerField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='importrecord',
+            constraint=models.UniqueConstraint(fields=('source', 'model', 'source_id'), name='unique_import_record'),
+        ),
+    ]
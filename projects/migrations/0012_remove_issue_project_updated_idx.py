@@ -0,0 +1,17 @@
+# Generated by Django 3.2.9 on 2026-10-18 20:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0011_importrecord'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='issue',
+            name='issue_project_updated_idx',
+        ),
+    ]
@@ -20,6 +20,8 @@ class Project(models.Model):
     description = models.TextField()
     type = models.CharField(max_length=2, choices=TYPE_CHOICE, default=BACK_END)
     author_user_id = models.IntegerField()
+    created_time = models.DateTimeField(auto_now_add=True)
+    updated_time = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Project id: {self.pk}"
@@ -51,6 +53,19 @@ class Issue(models.Model):
     assignee_user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name="issues_assignee")
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="issues")
     created_time = models.DateTimeField(auto_now_add=True)
+    updated_time = models.DateTimeField(auto_now=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'created_time'], name='issue_project_created_idx'),
+            models.Index(fields=['assignee_user', 'status'], name='issue_assignee_status_idx'),
+            models.Index(fields=['project', 'status', 'created_time'], name='issue_project_status_idx'),
+            models.Index(fields=['project', 'priority', 'created_time'], name='issue_project_priority_idx'),
+            models.Index(fields=['project', 'tag', 'created_time'], name='issue_project_tag_idx'),
+            models.Index(fields=['project', 'assignee_user', 'created_time'], name='issue_project_assignee_idx'),
+            models.Index(fields=['project', 'author_user', 'created_time'], name='issue_project_author_idx'),
+        ]
 
     def __str__(self):
         return f"Issue id: {self.pk} - Projet id: {self.project.id}"
@@ -61,6 +76,76 @@ class Comment(models.Model):
     author_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
     issue = models.ForeignKey(Issue, on_delete=models.CASCADE, related_name='comments')
     created_time = models.DateTimeField(auto_now_add=True)
+    updated_time = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['issue', 'created_time'], name='comment_issue_created_idx'),
+        ]
 
     def __str__(self):
         return f"Comment id: {self.pk} - Issue id: {self.issue.id}"
+
+
+class Change(models.Model):
+    """ Journal des modifications d'un projet, en ajout seul.
+        Son identifiant croissant sert de curseur à la synchronisation différentielle.
+    """
+    ISSUE = 'issue'
+    COMMENT = 'comment'
+    CONTRIBUTOR = 'contributor'
+    KIND_CHOICE = [(ISSUE, 'Problème'), (COMMENT, 'Commentaire'), (CONTRIBUTOR, 'Contributeur')]
+
+    CREATED = 'C'
+    UPDATED = 'U'
+    DELETED = 'D'
+    ACTION_CHOICE = [(CREATED, 'Création'), (UPDATED, 'Modification'), (DELETED, 'Suppression')]
+
+    project_id = models.IntegerField()
+    kind = models.CharField(max_length=11, choices=KIND_CHOICE)
+    object_id = models.IntegerField()
+    action = models.CharField(max_length=1, choices=ACTION_CHOICE)
+    created_time = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project_id', 'id'], name='change_project_idx'),
+        ]
+
+    def __str__(self):
+        return f"Change id: {self.pk} - Projet id: {self.project_id}"
+
+
+class ProjectStat(models.Model):
+    """ Compteur dénormalisé d'un projet, tenu à jour à chaque écriture d'un problème ou d'un commentaire.
+        Clés : 'issues', 'comments' et une par valeur des champs comptés ('status:TD', 'tag:BUG'...).
+    """
+    project_id = models.IntegerField()
+    key = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project_id', 'key'], name='unique_project_stat'),
+        ]
+
+    def __str__(self):
+        return f"ProjectStat {self.key}: {self.count} - Projet id: {self.project_id}"
+
+
+class ImportRecord(models.Model):
+    """ Correspondance entre un objet d'un fichier importé (source, type, identifiant d'origine)
+        et la ligne créée : une reprise d'import saute les objets déjà importés.
+    """
+    source = models.CharField(max_length=200)
+    model = models.CharField(max_length=11)
+    source_id = models.IntegerField()
+    object_id = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'model', 'source_id'], name='unique_import_record'),
+        ]
+
+    def __str__(self):
+        return f"ImportRecord {self.source} {self.model} {self.source_id} -> {self.object_id}"
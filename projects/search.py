@@ -0,0 +1,63 @@
+import re
+
+from django.db import connection, transaction
+
+# Poids bm25 des colonnes de projects_search : title, body, project, kind, issue_id
+WEIGHTS = '10.0, 1.0, 0.0, 0.0, 0.0'
+
+SEARCH_SQL = f"""
+    SELECT kind, rowid, issue_id,
+           snippet(projects_search, 0, '[', ']', '…', 12),
+           snippet(projects_search, 1, '[', ']', '…', 12),
+           bm25(projects_search, {WEIGHTS}) AS score
+    FROM projects_search
+    WHERE projects_search MATCH %s
+    ORDER BY score
+    LIMIT %s
+"""
+
+REBUILD_SQL = [
+    "DELETE FROM projects_search",
+    """INSERT INTO projects_search (rowid, title, body, project, kind, issue_id)
+       SELECT 2 * id, title, description, 'p' || project_id, 'issue', id FROM projects_issue""",
+    """INSERT INTO projects_search (rowid, title, body, project, kind, issue_id)
+       SELECT 2 * c.id + 1, '', c.description, 'p' || i.project_id, 'comment', c.issue_id
+       FROM projects_comment c JOIN projects_issue i ON i.id = c.issue_id""",
+    "INSERT INTO projects_search (projects_search) VALUES ('optimize')",
+]
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(project_id, text):
+    """ Expression MATCH FTS5 : tous les termes saisis (le dernier en préfixe) dans le projet `project_id`.
+        Les termes sont mis entre guillemets, la syntaxe FTS5 de l'utilisateur n'est donc pas interprétée.
+        Retourne None si la saisie ne contient aucun terme.
+    """
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return None
+    phrases = ' '.join(f'"{term}"' for term in terms) + '*'
+    return f'project : "p{project_id}" AND {{title body}} : ({phrases})'
+
+
+def search(project_id, text, limit):
+    """ Problèmes et commentaires du projet correspondant à `text`, du plus au moins pertinent """
+    expression = match_expression(project_id, text)
+    if expression is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [expression, limit])
+        rows = cursor.fetchall()
+    return [{'kind': kind, 'id': rowid // 2, 'issue': issue_id,
+             'snippet': body if '[' in body or not title else title, 'score': round(-score, 4)}
+            for kind, rowid, issue_id, title, body, score in rows]
+
+
+def rebuild():
+    """ Reconstruit entièrement l'index à partir des tables des problèmes et des commentaires """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for statement in REBUILD_SQL:
+            cursor.execute(statement)
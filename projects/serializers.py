@@ -1,8 +1,73 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Project, Issue, Comment
 
 
-class ReadCommentSerializer(serializers.ModelSerializer):
+def requested_names(request, param, path):
+    """ Noms demandés dans le paramètre ?fields= ou ?expand= pour le niveau d'imbrication `path`.
+        'issues.comments' demande 'issues' au niveau racine et 'comments' au niveau 'issues.'.
+        Retourne None si le paramètre est absent pour ce niveau.
+    """
+    if request is None or not request.query_params.get(param):
+        return None
+    names = set()
+    for name in request.query_params[param].split(','):
+        name = name.strip()
+        if name.startswith(path) and len(name) > len(path):
+            names.add(name[len(path):].split('.')[0])
+    return names or None
+
+
+class ExpandableFieldsMixin:
+    """ Sortie allégée à la demande :
+        - ?fields=id,title,issues.status limite les champs renvoyés à chaque niveau
+        - ?expand=issues,issues.comments remplace les listes d'identifiants des relations
+          par les objets imbriqués (Meta.expandable_fields)
+        setup_queryset() prépare la requête en conséquence : colonnes non demandées différées,
+        relations non développées chargées sous forme d'identifiants seulement.
+    """
+    always_loaded = ('id', 'created_time')
+
+    def __init__(self, *args, path='', **kwargs):
+        self.path = path
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        expand = requested_names(request, 'expand', self.path) or set()
+        for name, serializer_class in getattr(self.Meta, 'expandable_fields', {}).items():
+            if name in expand:
+                fields[name] = serializer_class(many=True, read_only=True, path=f'{self.path}{name}.')
+        fieldset = requested_names(request, 'fields', self.path)
+        if fieldset:
+            fields = {name: field for name, field in fields.items() if name in fieldset}
+        return fields
+
+    @classmethod
+    def setup_queryset(cls, queryset, request, path='', required=()):
+        model = cls.Meta.model
+        fieldset = requested_names(request, 'fields', path)
+        expand = requested_names(request, 'expand', path) or set()
+        if fieldset:
+            columns = {field.name for field in model._meta.concrete_fields if field.name in fieldset}
+            queryset = queryset.only(*columns.union(cls.always_loaded, required))
+
+        prefetches = []
+        for name, serializer_class in getattr(cls.Meta, 'expandable_fields', {}).items():
+            if fieldset and name not in fieldset:
+                continue
+            relation = getattr(model, name).field
+            related = relation.model.objects.all()
+            if name in expand:
+                related = serializer_class.setup_queryset(related, request, f'{path}{name}.', (relation.name,))
+            else:
+                related = related.only('id', relation.name)
+            prefetches.append(Prefetch(name, queryset=related))
+        return queryset.prefetch_related(*prefetches)
+
+
+class ReadCommentSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = '__all__'
@@ -14,12 +79,13 @@ class WriteCommentSerializer(serializers.ModelSerializer):
         exclude = ['issue', 'author_user']
 
 
-class ReadIssueSerializer(serializers.ModelSerializer):
-    comments = ReadCommentSerializer(many=True, read_only=True)
+class ReadIssueSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    comments = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
 
     class Meta:
         model = Issue
         fields = '__all__'
+        expandable_fields = {'comments': ReadCommentSerializer}
 
 
 class WriteIssueSerializer(serializers.ModelSerializer):
@@ -33,12 +99,91 @@ class WriteIssueSerializer(serializers.ModelSerializer):
         return value
 
 
-class ReadProjectSerializer(serializers.ModelSerializer):
-    issues = ReadIssueSerializer(many=True, read_only=True)
+class BulkIssueSerializer(WriteIssueSerializer):
+    """ Élément d'une création en masse de problèmes : l'assigné est contrôlé
+        contre l'ensemble des membres du projet (context['members']) sans requête par élément.
+    """
+    assignee_user = serializers.IntegerField(required=False, allow_null=True)
+
+    def validate_assignee_user(self, value):
+        if not value:
+            return self.context['request'].user.id
+        if value not in self.context['members']:
+            raise serializers.ValidationError("L'utilisateur assigné doit être un contributeur du projet.")
+        return value
+
+
+class IssueFilterSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Issue.STATUS_CHOICE, required=False)
+    tag = serializers.ChoiceField(choices=Issue.TAG_CHOICE, required=False)
+    assignee_user = serializers.IntegerField(required=False)
+
+
+class IssueListFilterSerializer(IssueFilterSerializer):
+    """ Filtres (?status=, ?priority=, ?tag=, ?assignee_user=, ?author_user=, ?created_after=, ?created_before=)
+        et tri (?ordering=) de la liste des problèmes. Chaque filtre, seul ou avec le tri, suit un index
+        (project, <filtre>, created_time) ; les filtres combinés sont appliqués sur les lignes de cet index.
+    """
+    LOOKUPS = {
+        'assignee_user': 'assignee_user_id',
+        'author_user': 'author_user_id',
+        'created_after': 'created_time__gte',
+        'created_before': 'created_time__lt',
+    }
+    # updated_time n'est pas proposé : une modification déplace le problème dans le tri, et la pagination par clé
+    # en sauterait ou en répéterait d'une page à l'autre
+    ORDERING_CHOICE = ['created_time', '-created_time']
+
+    priority = serializers.ChoiceField(choices=Issue.PRIORITY_CHOICE, required=False)
+    author_user = serializers.IntegerField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    ordering = serializers.ChoiceField(choices=ORDERING_CHOICE, required=False)
+
+    def get_filters(self):
+        return {self.LOOKUPS.get(name, name): value for name, value in self.validated_data.items()
+                if name != 'ordering'}
+
+    def get_ordering(self):
+        """ Tri total pour la pagination par clé : le champ demandé puis l'identifiant, dans le même sens """
+        field = self.validated_data.get('ordering', 'created_time')
+        return field, '-id' if field.startswith('-') else 'id'
+
+
+class IssueChangesSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Issue.STATUS_CHOICE, required=False)
+    priority = serializers.ChoiceField(choices=Issue.PRIORITY_CHOICE, required=False)
+    assignee_user = serializers.IntegerField(required=False)
+
+    def validate_assignee_user(self, value):
+        if value not in self.context['members']:
+            raise serializers.ValidationError("L'utilisateur assigné doit être un contributeur du projet.")
+        return value
+
+
+class BulkIssueUpdateSerializer(serializers.Serializer):
+    """ Modification en masse : une liste d'identifiants (ids) ou un filtre (filter),
+        et les champs à modifier (changes).
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=10000)
+    filter = IssueFilterSerializer(required=False)
+    changes = IssueChangesSerializer()
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Indiquez soit une liste de problèmes (ids), soit un filtre (filter).")
+        if not attrs['changes']:
+            raise serializers.ValidationError("Aucune modification demandée.")
+        return attrs
+
+
+class ReadProjectSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    issues = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
 
     class Meta:
         model = Project
         fields = '__all__'
+        expandable_fields = {'issues': ReadIssueSerializer}
 
 
 class WriteProjectSerializer(serializers.ModelSerializer):
@@ -0,0 +1,175 @@
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from contributors.models import Contributor
+from contributors.membership import in_bulk
+from . import changes, stats
+from .cache import response_cache
+from .models import Project, Issue, Comment, Change, ProjectStat
+
+
+# Les opérations en masse (bulk_create, update) n'émettent pas post_save : ces signaux
+# permettent aux caches et aux données dérivées de suivre les problèmes concernés.
+# Arguments : project_id, ids (liste des problèmes concernés)
+issues_bulk_created = Signal()
+# Arguments : project_id, ids, changes (dictionnaire des champs modifiés)
+issues_bulk_updated = Signal()
+
+
+def comment_project_id(comment):
+    """ Projet d'un commentaire, lu une seule fois pour l'ensemble des récepteurs """
+    if not hasattr(comment, '_project_id'):
+        comment._project_id = Issue.objects.filter(pk=comment.issue_id).values_list('project_id', flat=True).first()
+    return comment._project_id
+
+
+@receiver([post_save, post_delete], sender=Issue)
+def touch_project(sender, instance, **kwargs):
+    """ La représentation d'un projet contient ses problèmes : sa date de modification suit la leur """
+    Project.objects.filter(pk=instance.project_id).update(updated_time=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def touch_issue_and_project(sender, instance, **kwargs):
+    """ Un commentaire modifie la représentation de son problème et celle du projet """
+    now = timezone.now()
+    Issue.objects.filter(pk=instance.issue_id).update(updated_time=now)
+    Project.objects.filter(issues=instance.issue_id).update(updated_time=now)
+
+
+@receiver([issues_bulk_created, issues_bulk_updated], sender=Issue)
+def touch_project_after_bulk(sender, project_id, **kwargs):
+    Project.objects.filter(pk=project_id).update(updated_time=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_project_response(sender, instance, **kwargs):
+    response_cache.invalidate('project', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Contributor)
+def invalidate_project_response_on_membership(sender, instance, **kwargs):
+    response_cache.invalidate('project', instance.project_id)
+
+
+@receiver([post_save, post_delete], sender=Issue)
+def invalidate_issue_response(sender, instance, **kwargs):
+    response_cache.invalidate('issue', instance.pk)
+    response_cache.invalidate('project', instance.project_id)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_response(sender, instance, **kwargs):
+    response_cache.invalidate('issue', instance.issue_id)
+    project_id = comment_project_id(instance)
+    if project_id is not None:
+        response_cache.invalidate('project', project_id)
+
+
+@receiver([issues_bulk_created, issues_bulk_updated], sender=Issue)
+def invalidate_responses_after_bulk(sender, project_id, ids, **kwargs):
+    for pk in ids:
+        response_cache.invalidate('issue', pk)
+    response_cache.invalidate('project', project_id)
+
+
+def action(kwargs):
+    if 'created' not in kwargs:
+        return Change.DELETED
+    return Change.CREATED if kwargs['created'] else Change.UPDATED
+
+
+@receiver([post_save, post_delete], sender=Issue)
+def record_issue_change(sender, instance, **kwargs):
+    changes.record(instance.project_id, Change.ISSUE, [instance.pk], action(kwargs))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def record_comment_change(sender, instance, **kwargs):
+    project_id = comment_project_id(instance)
+    if project_id is not None:
+        changes.record(project_id, Change.COMMENT, [instance.pk], action(kwargs))
+
+
+@receiver([post_save, post_delete], sender=Contributor)
+def record_contributor_change(sender, instance, **kwargs):
+    """ Les ajouts et retraits en masse inscrivent eux-mêmes leurs modifications """
+    if not in_bulk():
+        changes.record(instance.project_id, Change.CONTRIBUTOR, [instance.pk], action(kwargs))
+
+
+@receiver(issues_bulk_created, sender=Issue)
+def record_bulk_issue_creation(sender, project_id, ids, **kwargs):
+    changes.record(project_id, Change.ISSUE, ids, Change.CREATED)
+
+
+@receiver(issues_bulk_updated, sender=Issue)
+def record_bulk_issue_update(sender, project_id, ids, **kwargs):
+    changes.record(project_id, Change.ISSUE, ids, Change.UPDATED)
+
+
+@receiver(post_delete, sender=Project)
+def delete_project_changes(sender, instance, **kwargs):
+    """ Le projet est supprimé après ses problèmes, commentaires et contributeurs : son journal aussi """
+    Change.objects.filter(project_id=instance.pk).delete()
+
+
+@receiver([pre_save, pre_delete], sender=Issue)
+def load_issue_counted_values(sender, instance, **kwargs):
+    """ Les compteurs d'une modification se calculent par différence avec les valeurs en base,
+        lues dans la transaction de l'écriture. comment_count, tenu à jour par des UPDATE atomiques,
+        reprend sa valeur en base : la sauvegarde ne réécrit pas celle chargée avec l'instance.
+    """
+    if not instance._state.adding:
+        values = stats.stored_values(instance)
+        if values is not None:
+            instance.comment_count = values.pop('comment_count')
+        instance._stats_old = values
+
+
+@receiver(post_save, sender=Issue)
+def count_issue_save(sender, instance, created, update_fields, **kwargs):
+    stats.issue_saved(instance, created, getattr(instance, '_stats_old', None), update_fields)
+
+
+@receiver(post_delete, sender=Issue)
+def count_issue_delete(sender, instance, **kwargs):
+    stats.issue_deleted(instance._stats_old)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment_save(sender, instance, created, **kwargs):
+    if created:
+        stats.comment_saved(instance, comment_project_id(instance), 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_comment_delete(sender, instance, **kwargs):
+    stats.comment_saved(instance, comment_project_id(instance), -1)
+
+
+@receiver(issues_bulk_created, sender=Issue)
+def count_bulk_issue_creation(sender, project_id, ids, **kwargs):
+    stats.issues_created(project_id, ids)
+
+
+@receiver(issues_bulk_updated, sender=Issue)
+def count_bulk_issue_update(sender, project_id, changes, **kwargs):
+    """ Les valeurs remplacées par un UPDATE en masse ne sont plus connues :
+        seuls les compteurs des champs modifiés sont recalculés, sur l'index (project, <champ>)
+    """
+    fields = tuple(field for field in stats.FIELDS if field in changes)
+    if fields:
+        stats.recount(project_id, fields, comments=False)
+
+
+@receiver(post_save, sender=Project)
+def create_project_stats(sender, instance, created, **kwargs):
+    if created:
+        stats.create_counters(instance.pk)
+
+
+@receiver(post_delete, sender=Project)
+def delete_project_stats(sender, instance, **kwargs):
+    ProjectStat.objects.filter(project_id=instance.pk).delete()
@@ -0,0 +1,144 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Issue, Comment, ProjectStat
+
+ISSUES = 'issues'
+COMMENTS = 'comments'
+FIELDS = ('status', 'priority', 'tag')
+TRACKED = ('project_id',) + FIELDS
+
+
+def issue_keys(values):
+    """ Compteurs auxquels contribue un problème : le total et un par champ compté """
+    return [ISSUES] + [f'{field}:{values[field]}' for field in FIELDS]
+
+
+def snapshot(issue, update_fields=None, old_values=None):
+    """ Valeurs comptées de l'instance après sa sauvegarde : avec update_fields,
+        les champs non écrits gardent leur valeur en base
+    """
+    if update_fields is None:
+        return {field: getattr(issue, field) for field in TRACKED}
+    written = {issue._meta.get_field(name).attname for name in update_fields}
+    return {field: getattr(issue, field) if field in written else old_values[field] for field in TRACKED}
+
+
+def stored_values(issue):
+    """ Valeurs comptées du problème en base et son nombre de commentaires, lus avant son écriture :
+        les valeurs chargées avec l'instance ne sont pas fiables (instance ancienne, modifiée par ailleurs
+        ou chargée avec des champs différés)
+    """
+    return Issue.objects.filter(pk=issue.pk).values('comment_count', *TRACKED).first()
+
+
+def all_keys():
+    return [ISSUES, COMMENTS] + [f'{field}:{value}' for field in FIELDS
+                                 for value, _ in Issue._meta.get_field(field).choices]
+
+
+def create_counters(project_id):
+    """ Compteurs à zéro d'un nouveau projet : les écritures suivantes n'ont plus qu'à les incrémenter """
+    ProjectStat.objects.bulk_create([ProjectStat(project_id=project_id, key=key) for key in all_keys()],
+                                    ignore_conflicts=True)
+
+
+def add(project_id, deltas):
+    """ Applique les variations {clé: n} aux compteurs du projet : un UPDATE count = count + n
+        par valeur de n. Les compteurs encore absents (projets antérieurs aux statistiques) sont créés.
+    """
+    keys_by_delta = defaultdict(list)
+    for key, delta in deltas.items():
+        if delta:
+            keys_by_delta[delta].append(key)
+    with transaction.atomic(savepoint=False):
+        for delta, keys in keys_by_delta.items():
+            counters = ProjectStat.objects.filter(project_id=project_id, key__in=keys)
+            if counters.update(count=F('count') + delta) < len(keys):
+                existing = set(counters.values_list('key', flat=True))
+                ProjectStat.objects.bulk_create([ProjectStat(project_id=project_id, key=key, count=delta)
+                                                 for key in keys if key not in existing])
+
+
+def issue_saved(issue, created, old_values, update_fields=None):
+    new_values = snapshot(issue, None if created else update_fields, old_values)
+    if created:
+        add(issue.project_id, dict.fromkeys(issue_keys(new_values), 1))
+    elif old_values != new_values:
+        if old_values['project_id'] == issue.project_id:
+            deltas = Counter(issue_keys(new_values))
+            deltas.subtract(issue_keys(old_values))
+            add(issue.project_id, deltas)
+        else:
+            add(old_values['project_id'], dict.fromkeys(issue_keys(old_values), -1))
+            add(issue.project_id, dict.fromkeys(issue_keys(new_values), 1))
+
+
+def issue_deleted(old_values):
+    add(old_values['project_id'], dict.fromkeys(issue_keys(old_values), -1))
+
+
+def issues_created(project_id, ids):
+    """ Problèmes créés en masse : une requête groupée pour l'ensemble des problèmes """
+    deltas = Counter()
+    rows = Issue.objects.filter(id__in=ids).order_by().values(*FIELDS).annotate(count=Count('id'))
+    for row in rows:
+        for key in issue_keys(row):
+            deltas[key] += row['count']
+    add(project_id, deltas)
+
+
+def comment_saved(comment, project_id, delta):
+    Issue.objects.filter(pk=comment.issue_id).update(comment_count=F('comment_count') + delta)
+    if project_id is not None:
+        add(project_id, {COMMENTS: delta})
+
+
+def read(project_id):
+    """ Statistiques du projet, lues sur ses seuls compteurs """
+    counters = dict(ProjectStat.objects.filter(project_id=project_id).values_list('key', 'count'))
+    stats = {ISSUES: counters.get(ISSUES, 0), COMMENTS: counters.get(COMMENTS, 0)}
+    for field in FIELDS:
+        stats[field] = {value: counters.get(f'{field}:{value}', 0)
+                        for value, _ in Issue._meta.get_field(field).choices}
+    return stats
+
+
+def recount(project_id, fields=FIELDS, comments=True):
+    """ Recalcule depuis les tables les compteurs du projet (tous, ou ceux des champs `fields`)
+        et corrige ceux qui ont dérivé. Retourne les écarts {clé: (compteur, valeur réelle)}.
+    """
+    issues = Issue.objects.filter(project_id=project_id)
+    prefixes = [f'{field}:' for field in fields]
+    if tuple(fields) == FIELDS:
+        prefixes.append(ISSUES)
+    if comments:
+        prefixes.append(COMMENTS)
+
+    drift = {}
+    with transaction.atomic():
+        actual = {}
+        for field in fields:
+            for value, count in issues.order_by().values_list(field).annotate(count=Count('id')):
+                actual[f'{field}:{value}'] = count
+        if ISSUES in prefixes:
+            actual[ISSUES] = issues.count()
+        if comments:
+            actual[COMMENTS] = Comment.objects.filter(issue__project_id=project_id).count()
+
+        stored = {key: count for key, count
+                  in ProjectStat.objects.filter(project_id=project_id).values_list('key', 'count')
+                  if key.startswith(tuple(prefixes))}
+        for key in stored.keys() | actual.keys():
+            if stored.get(key, 0) != actual.get(key, 0):
+                drift[key] = (stored.get(key, 0), actual.get(key, 0))
+        add(project_id, {key: real - counter for key, (counter, real) in drift.items()})
+
+        if comments:
+            drifted = issues.annotate(real=Count('comments')).exclude(comment_count=F('real'))
+            for pk, counter, real in drifted.values_list('id', 'comment_count', 'real'):
+                Issue.objects.filter(pk=pk).update(comment_count=real)
+                drift[f'issue:{pk}:comments'] = (counter, real)
+    return drift
@@ -1,3 +1,872 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import TransactionTestCase, override_settings
+from django.urls import path, reverse
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from contributors import membership
+from contributors.models import Contributor
+from users.models import User
+from . import benchmark, export, loadtest, stats, urls
+from .cache import response_cache
+from .conditional import ConditionalRetrieveMixin
+from .models import Project, Issue, Comment, Change, ProjectStat, ImportRecord
+from .signals import issues_bulk_updated
+from .views import ProjectChanges, ProjectDetail
+
+
+class ProjectTestCase(APITestCase):
+    """ Jeu de données commun : un projet dont l'utilisateur connecté est responsable et contributeur """
+
+    def setUp(self):
+        membership.cache.clear()
+        response_cache.backend.clear()
+        self.user = User.objects.create_user(email='owner@test.fr', password='secret')
+        self.project = self.create_project(self.user)
+        self.client.force_authenticate(self.user)
+
+    def create_project(self, user, title='Projet'):
+        project = Project.objects.create(title=title, description='Description', author_user_id=user.id)
+        Contributor.objects.create(project=project, user=user, role=Contributor.OWNER)
+        Contributor.objects.create(project=project, user=user, role=Contributor.CONTRIBUTOR)
+        return project
+
+    def create_issues(self, project, nb_issues, nb_comments):
+        for i in range(nb_issues):
+            issue = Issue.objects.create(title=f'Problème {i}', description='Description', project=project,
+                                         author_user=self.user, assignee_user=self.user)
+            for j in range(nb_comments):
+                Comment.objects.create(description=f'Commentaire {j}', issue=issue, author_user=self.user)
+
+
+class NestedReadQueriesTests(ProjectTestCase):
+    """ Le nombre de requêtes SQL des lectures imbriquées ne dépend pas du volume de données """
+
+    def assertConstantQueries(self, num, url):
+        self.create_issues(self.project, 1, 1)
+        self.client.get(url)
+        response_cache.backend.clear()
+        with self.assertNumQueries(num):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.create_issues(self.project, 5, 4)
+        with self.assertNumQueries(num):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_project_list(self):
+        self.create_project(self.user, title='Autre projet')
+        self.assertConstantQueries(4, reverse('project') + '?expand=issues.comments')
+
+    def test_project_detail(self):
+        self.assertConstantQueries(5, reverse('project-detail', args=[self.project.id]) + '?expand=issues.comments')
+
+    def test_issue_list(self):
+        self.assertConstantQueries(3, reverse('issue', args=[self.project.id]) + '?expand=comments')
+
+    def test_issue_detail(self):
+        self.create_issues(self.project, 1, 3)
+        issue = Issue.objects.first()
+        url = reverse('issue-detail', args=[self.project.id, issue.id]) + '?expand=comments'
+        self.client.get(url)
+        response_cache.backend.clear()
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['comments']), 3)
+
+
+class SparseFieldsetTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_issues(self.project, 2, 2)
+        self.url = reverse('project-detail', args=[self.project.id])
+
+    def test_ids_only_by_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['issues'], list(Issue.objects.values_list('id', flat=True)))
+
+    def test_expand(self):
+        response = self.client.get(self.url, {'expand': 'issues.comments'})
+        self.assertEqual(len(response.data['issues'][0]['comments']), 2)
+        self.assertEqual(response.data['issues'][0]['comments'][0]['description'], 'Commentaire 0')
+
+    def test_fields(self):
+        self.client.get(self.url)
+        response_cache.backend.clear()
+        with self.assertNumQueries(3) as context:
+            response = self.client.get(self.url, {'fields': 'id,title'})
+        self.assertEqual(set(response.data), {'id', 'title'})
+        self.assertNotIn('description', context.captured_queries[-1]['sql'])
+
+    def test_nested_fields(self):
+        response = self.client.get(self.url, {'fields': 'title,issues.status', 'expand': 'issues'})
+        self.assertEqual(set(response.data), {'title', 'issues'})
+        self.assertEqual(response.data['issues'][0], {'status': Issue.TO_DO})
+
+
+class BulkIssueCreateTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('issue', args=[self.project.id])
+
+    def test_bulk_create(self):
+        items = [{'title': f'Problème {i}', 'description': 'Description', 'status': Issue.IN_PROGRESS}
+                 for i in range(50)]
+        with self.assertNumQueries(13):
+            response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 201)
+        issues = Issue.objects.order_by('id')
+        self.assertEqual([item['id'] for item in response.data], [issue.id for issue in issues])
+        self.assertEqual(issues[49].title, 'Problème 49')
+        self.assertEqual(issues[0].assignee_user_id, self.user.id)
+
+    def test_all_or_nothing(self):
+        outsider = User.objects.create_user(email='outsider@test.fr', password='secret')
+        items = [{'title': 'Valide', 'description': 'Description'},
+                 {'title': 'Invalide', 'description': 'Description', 'status': 'XX'},
+                 {'title': 'Assigné', 'description': 'Description', 'assignee_user': outsider.id}]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('status', response.data[1])
+        self.assertIn('assignee_user', response.data[2])
+        self.assertFalse(Issue.objects.exists())
+
+
+class BulkIssueUpdateTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_issues(self.project, 5, 0)
+        self.url = reverse('issue-bulk', args=[self.project.id])
+
+    def test_update_by_ids(self):
+        ids = list(Issue.objects.values_list('id', flat=True)[:3])
+        updated = []
+        issues_bulk_updated.connect(lambda **kwargs: updated.append(kwargs['ids']), weak=False,
+                                    dispatch_uid='test_update_by_ids')
+        try:
+            response = self.client.patch(self.url, {'ids': ids, 'changes': {'status': Issue.ENDED}}, format='json')
+        finally:
+            issues_bulk_updated.disconnect(dispatch_uid='test_update_by_ids')
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual([sorted(pks) for pks in updated], [sorted(ids)])
+        self.assertEqual(Issue.objects.filter(status=Issue.ENDED).count(), 3)
+
+    def test_update_by_filter(self):
+        Issue.objects.filter(pk=Issue.objects.first().pk).update(tag=Issue.TASK)
+        bugs = set(Issue.objects.filter(tag=Issue.BUG).values_list('id', flat=True))
+        response = self.client.patch(self.url, {'filter': {'tag': Issue.BUG},
+                                                'changes': {'priority': Issue.HIGH_PRIORITY}}, format='json')
+        self.assertEqual(response.data['updated'], 4)
+        self.assertEqual(set(response.data['ids']), bugs)
+        self.assertEqual(set(Issue.objects.filter(priority=Issue.HIGH_PRIORITY).values_list('id', flat=True)), bugs)
+
+    def test_only_own_issues(self):
+        other = User.objects.create_user(email='other@test.fr', password='secret')
+        Contributor.objects.create(project=self.project, user=other, role=Contributor.CONTRIBUTOR)
+        self.client.force_authenticate(other)
+        ids = list(Issue.objects.values_list('id', flat=True))
+        response = self.client.patch(self.url, {'ids': ids, 'changes': {'status': Issue.ENDED}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Issue.objects.filter(status=Issue.ENDED).exists())
+
+
+class BulkContributorTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.users = [User.objects.create_user(email=f'user{i}@test.fr', password='secret') for i in range(3)]
+        Contributor.objects.create(project=self.project, user=self.users[0], role=Contributor.CONTRIBUTOR)
+        self.url = reverse('project-user', args=[self.project.id])
+
+    def test_bulk_add(self):
+        response = self.client.post(self.url, [self.users[0].id, self.users[1].id, 'user2@test.fr'], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'added': [self.users[1].id, self.users[2].id], 'skipped': [self.users[0].id]})
+        self.assertIn(self.users[2].id, membership.project_members(self.project.id))
+        self.users[2].refresh_from_db()
+        self.assertEqual(self.users[2].membership_version, 1)
+
+    def test_unknown_user(self):
+        response = self.client.post(self.url, [self.users[1].id, 'inconnu@test.fr'], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Contributor.objects.filter(project=self.project).count(), 3)
+
+    def test_bulk_remove(self):
+        membership.project_members(self.project.id)
+        with self.assertNumQueries(10):
+            response = self.client.delete(self.url, ['user0@test.fr', self.users[1].id], format='json')
+        self.assertEqual(response.data, {'removed': [self.users[0].id], 'skipped': [self.users[1].id]})
+        self.assertNotIn(self.users[0].id, membership.project_members(self.project.id))
+
+    def test_cannot_remove_owner(self):
+        response = self.client.delete(self.url, [self.user.id], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_issues(self.project, 1, 1)
+        self.issue = Issue.objects.get()
+        self.url = reverse('project-detail', args=[self.project.id])
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_parameters(self):
+        self.assertNotEqual(self.client.get(self.url)['ETag'],
+                            self.client.get(self.url, {'expand': 'issues'})['ETag'])
+
+    def test_nested_write_changes_etag(self):
+        issue_url = reverse('issue-detail', args=[self.project.id, self.issue.id])
+        project_etag = self.client.get(self.url)['ETag']
+        issue_etag = self.client.get(issue_url)['ETag']
+        Comment.objects.create(description='Nouveau', issue=self.issue, author_user=self.user)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=project_etag).status_code, 200)
+        self.assertEqual(self.client.get(issue_url, HTTP_IF_NONE_MATCH=issue_etag).status_code, 200)
+
+    def test_permissions_checked_before_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_authenticate(User.objects.create_user(email='other@test.fr', password='secret'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 400)
+
+    def test_default_version_queryset(self):
+        view = ConditionalRetrieveMixin()
+        view.get_queryset, view.kwargs = Project.objects.all, {'pk': self.project.id}
+        self.assertEqual(list(view.get_version_queryset()), [self.project])
+
+
+class ResponseCacheTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_issues(self.project, 2, 1)
+        self.issue = Issue.objects.first()
+        self.url = reverse('project-detail', args=[self.project.id])
+
+    def test_hit(self):
+        stats = response_cache.stats()
+        first = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            second = self.client.get(self.url)
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(response_cache.stats(), {'hits': stats['hits'] + 1, 'misses': stats['misses'] + 1})
+
+    def test_other_project_not_served(self):
+        self.client.get(reverse('issue-detail', args=[self.project.id, self.issue.id]))
+        other = User.objects.create_user(email='other@test.fr', password='secret')
+        self.client.force_authenticate(other)
+        response = self.client.get(reverse('issue-detail', args=[self.create_project(other).id, self.issue.id]))
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('X-Cache', response)
+
+    def test_comment_invalidates_issue_and_project(self):
+        other = Issue.objects.last()
+        urls = [self.url, reverse('issue-detail', args=[self.project.id, self.issue.id]),
+                reverse('issue-detail', args=[self.project.id, other.id])]
+        for url in urls:
+            self.client.get(url)
+        Comment.objects.create(description='Nouveau', issue=self.issue, author_user=self.user)
+        self.assertEqual([self.client.get(url)['X-Cache'] for url in urls], ['MISS', 'MISS', 'HIT'])
+
+    def test_bulk_update_invalidates(self):
+        issue_url = reverse('issue-detail', args=[self.project.id, self.issue.id])
+        self.client.get(issue_url)
+        self.client.patch(reverse('issue-bulk', args=[self.project.id]),
+                          {'ids': [self.issue.id], 'changes': {'status': Issue.ENDED}}, format='json')
+        response = self.client.get(issue_url)
+        self.assertEqual((response['X-Cache'], response.data['status']), ('MISS', Issue.ENDED))
+
+
+class ProjectChangesTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_issues(self.project, 2, 1)
+        self.url = reverse('project-changes', args=[self.project.id])
+        self.cursor = self.client.get(self.url).data['cursor']
+
+    def test_delta(self):
+        first, second = Issue.objects.order_by('id')
+        first_id, comment_id = first.id, first.comments.get().id
+        second.title = 'Modifié'
+        second.save()
+        first.delete()
+        other = User.objects.create_user(email='other@test.fr', password='secret')
+        contributor = Contributor.objects.create(project=self.project, user=other, role=Contributor.CONTRIBUTOR)
+
+        response = self.client.get(self.url, {'since': self.cursor})
+        self.assertEqual([issue['title'] for issue in response.data['issues']['updated']], ['Modifié'])
+        self.assertEqual(response.data['issues']['deleted'], [first_id])
+        self.assertEqual(response.data['comments']['deleted'], [comment_id])
+        self.assertEqual([c['id'] for c in response.data['contributors']['updated']], [contributor.id])
+        self.assertGreater(int(response.data['cursor']), int(self.cursor))
+
+        response = self.client.get(self.url, {'since': response.data['cursor']})
+        self.assertEqual(response.data['issues'], {'updated': [], 'deleted': []})
+
+    def test_bulk_operations_are_logged(self):
+        self.client.post(reverse('issue', args=[self.project.id]), [{'title': 'Import', 'description': 'D'}],
+                         format='json')
+        response = self.client.get(self.url, {'since': self.cursor})
+        self.assertEqual([issue['title'] for issue in response.data['issues']['updated']], ['Import'])
+
+    def test_paging(self):
+        Comment.objects.create(description='Nouveau', issue=Issue.objects.first(), author_user=self.user)
+        Comment.objects.create(description='Nouveau', issue=Issue.objects.first(), author_user=self.user)
+        with mock.patch.object(ProjectChanges, 'limit', 1):
+            response = self.client.get(self.url, {'since': self.cursor})
+        self.assertTrue(response.data['more'])
+        self.assertEqual(len(response.data['comments']['updated']), 1)
+
+
+class ProjectStatsTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_issues(self.project, 3, 2)
+        self.url = reverse('project-stats', args=[self.project.id])
+
+    def test_counters_follow_writes(self):
+        issue = Issue.objects.first()
+        issue.status = Issue.ENDED
+        issue.save()
+        Comment.objects.filter(issue=issue).first().delete()
+        self.client.post(reverse('issue', args=[self.project.id]), [{'title': 'Import', 'description': 'D',
+                                                                    'tag': Issue.TASK}], format='json')
+        self.client.patch(reverse('issue-bulk', args=[self.project.id]),
+                          {'ids': [issue.id], 'changes': {'priority': Issue.HIGH_PRIORITY}}, format='json')
+        Issue.objects.last().delete()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['issues'], 3)
+        self.assertEqual(response.data['comments'], 5)
+        self.assertEqual(response.data['status'], {Issue.TO_DO: 2, Issue.IN_PROGRESS: 0, Issue.ENDED: 1})
+        self.assertEqual(response.data['priority'][Issue.HIGH_PRIORITY], 1)
+        self.assertEqual(response.data['tag'], {Issue.BUG: 3, Issue.IMPROVEMENT: 0, Issue.TASK: 0})
+        self.assertEqual(Issue.objects.get(pk=issue.pk).comment_count, 1)
+
+    def test_save_keeps_comment_count(self):
+        issue = Issue.objects.first()
+        Comment.objects.create(description='Nouveau', issue=issue, author_user=self.user)
+        issue.title = 'Modifié'
+        issue.save()
+        self.assertEqual(Issue.objects.get(pk=issue.pk).comment_count, 3)
+
+    def test_stale_instance(self):
+        issue, stale = Issue.objects.first(), Issue.objects.first()
+        issue.status = Issue.ENDED
+        issue.save()
+        stale.status = Issue.IN_PROGRESS
+        stale.priority = Issue.HIGH_PRIORITY
+        stale.save(update_fields=['status'])
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['status'], {Issue.TO_DO: 2, Issue.IN_PROGRESS: 1, Issue.ENDED: 0})
+        self.assertEqual(response.data['priority'][Issue.HIGH_PRIORITY], 0)
+        self.assertEqual(stats.recount(self.project.id), {})
+
+    def test_repair(self):
+        ProjectStat.objects.filter(project_id=self.project.id, key='issues').update(count=10)
+        Issue.objects.filter(pk=Issue.objects.first().pk).update(comment_count=0)
+        out = mock.Mock()
+        call_command('repair_stats', self.project.id, stdout=out)
+        self.assertEqual(self.client.get(self.url).data['issues'], 3)
+        self.assertEqual(list(Issue.objects.values_list('comment_count', flat=True)), [2, 2, 2])
+        call_command('repair_stats', stdout=out)
+        out.write.assert_called_with(mock.ANY)
+        self.assertIn('0 projet', out.write.call_args[0][0])
+
+
+class ProjectExportTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('project-export', args=[self.project.id])
+
+    def export(self, **headers):
+        response = self.client.get(self.url, **headers)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_records(self):
+        self.create_issues(self.project, 2, 1)
+        response, content = self.export()
+        records = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual([record['model'] for record in records],
+                         ['project', 'contributor', 'contributor', 'issue', 'issue', 'comment', 'comment'])
+        self.assertEqual(records[0]['author'], 'owner@test.fr')
+        self.assertEqual(records[3]['assignee'], 'owner@test.fr')
+        self.assertEqual(records[5]['issue'], records[3]['id'])
+
+    def test_queries_do_not_depend_on_size(self):
+        self.create_issues(self.project, 1, 1)
+        self.export()
+        # 5 lectures dans un même instantané (SAVEPOINT et RELEASE SAVEPOINT dans un test)
+        with self.assertNumQueries(7):
+            self.export()
+        self.create_issues(self.project, 20, 3)
+        with self.assertNumQueries(7):
+            self.export()
+
+    def test_gzip(self):
+        self.create_issues(self.project, 3, 2)
+        response, content = self.export(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(content), self.export()[1])
+        for accept in ['gzip;q=0, deflate', 'deflate, gzip ; q=0.0', 'x-gzipped', 'nogzip']:
+            self.assertFalse(self.export(HTTP_ACCEPT_ENCODING=accept)[0].has_header('Content-Encoding'), accept)
+        self.assertTrue(self.export(HTTP_ACCEPT_ENCODING='gzip;q=0.5')[0].has_header('Content-Encoding'))
+
+
+class ExportSnapshotTests(TransactionTestCase):
+    """ Les écritures d'une autre connexion pendant l'export n'y apparaissent pas """
+
+    def test_single_snapshot(self):
+        user = User.objects.create_user(email='owner@test.fr', password='secret')
+        project = Project.objects.create(title='Projet', description='Description', author_user_id=user.id)
+        issue = Issue.objects.create(title='Problème', description='D', project=project, author_user=user,
+                                     assignee_user=user)
+        records = export.project_records(project.id)
+        next(records)
+
+        def write():
+            Comment.objects.create(description='Pendant l\'export', issue=issue, author_user=user)
+            connection.close()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+        self.assertEqual([json.loads(line)['model'] for line in records], ['issue'])
+        self.assertEqual(Comment.objects.count(), 1)
+
+
+class ImportProjectsTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_issues(self.project, 3, 2)
+        response = self.client.get(reverse('project-export', args=[self.project.id]))
+        self.content = b''.join(response.streaming_content)
+        self.project.delete()
+        fd, self.path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def import_projects(self, content, *args):
+        with open(self.path, 'wb') as file:
+            file.write(content)
+        stdout = io.StringIO()
+        call_command('import_projects', self.path, '--batch-size', '4', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_import(self):
+        self.import_projects(self.content)
+        project = Project.objects.get()
+        issues = project.issues.order_by('id')
+        self.assertEqual([issue.title for issue in issues], ['Problème 0', 'Problème 1', 'Problème 2'])
+        self.assertEqual([issue.comment_count for issue in issues], [2, 2, 2])
+        self.assertEqual(Contributor.objects.filter(project=project, user=self.user).count(), 2)
+        self.assertEqual(self.client.get(reverse('project-stats', args=[project.id])).data['comments'], 6)
+        self.assertEqual(ImportRecord.objects.count(), 1 + 3 + 6)
+        exported = [parse_datetime(record['created_time']) for record in map(json.loads, self.content.splitlines())
+                    if record['model'] == 'issue']
+        self.assertEqual([issue.created_time for issue in issues], exported)
+        self.assertTrue(Issue._meta.get_field('created_time').auto_now_add)
+        logged = Change.objects.filter(project_id=project.id, action=Change.CREATED)
+        self.assertEqual(Counter(logged.values_list('kind', flat=True)),
+                         {Change.CONTRIBUTOR: 2, Change.ISSUE: 3, Change.COMMENT: 6})
+
+    def test_resume(self):
+        lines = self.content.splitlines(keepends=True)
+        broken = b''.join(lines[:6]) + b'{"model": "comment", "id": 999, "issue": 999}\n'
+        with self.assertRaises(CommandError):
+            self.import_projects(broken)
+        self.assertEqual(Issue.objects.count(), 1)
+        issue = Issue.objects.get()
+        url = reverse('issue-detail', args=[issue.project_id, issue.id]) + '?expand=comments'
+        self.assertEqual(self.client.get(url).data['comments'], [])
+        output = self.import_projects(self.content)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['comments']), 2)
+        self.assertGreater(Issue.objects.get(pk=issue.pk).updated_time, issue.updated_time)
+        self.assertIn('8 objets créés (comment 6, contributor 0, issue 2, project 0)', output)
+        self.assertEqual(Project.objects.count(), 1)
+        self.assertEqual(Issue.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 6)
+
+    def test_invalid_choice(self):
+        content = self.content.replace(b'"status": "TD"', b'"status": "XX"', 1)
+        with self.assertRaisesMessage(CommandError, "valeur 'XX' invalide pour status"):
+            self.import_projects(content)
+        self.assertFalse(Issue.objects.exists())
+
+    def test_unknown_users(self):
+        content = self.content.replace(b'owner@test.fr', b'ancien@test.fr')
+        with self.assertRaises(CommandError):
+            self.import_projects(content)
+        self.import_projects(content, '--create-users')
+        self.assertFalse(User.objects.get(email='ancien@test.fr').is_active)
+
+
+class BenchmarkTests(APITestCase):
+
+    def setUp(self):
+        membership.cache.clear()
+        response_cache.backend.clear()
+        call_command('seed_benchmark', '--users', '20', '--projects', '4', '--contributors', '12', '--issues', '40',
+                     '--comments', '120', '--batch-size', '50', stdout=mock.Mock())
+
+    def test_seed(self):
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Project.objects.count(), 4)
+        self.assertEqual(Issue.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 120)
+        self.assertEqual(sum(Issue.objects.values_list('comment_count', flat=True)), 120)
+        for project in Project.objects.all():
+            self.assertEqual(stats.recount(project.id), {})
+        call_command('seed_benchmark', '--users', '20', '--projects', '4', '--contributors', '12', '--issues', '40',
+                     '--comments', '120', stdout=mock.Mock())
+        self.assertEqual(Comment.objects.count(), 120)
+
+    def test_bench_covers_every_route(self):
+        self.assertEqual(set(benchmark.SCENARIOS), {pattern.name for pattern in urls.urlpatterns})
+        output = io.StringIO()
+        call_command('bench', '--requests', '2', '--warmup', '1', '--targets', '2', stdout=output)
+        results = json.loads(output.getvalue())
+        self.assertEqual(results['skipped'], [])
+        self.assertEqual(results['dataset']['comments'], 120)
+        for name, result in results['routes'].items():
+            self.assertTrue(all(code < '400' for code in result['status']), name)
+        self.assertEqual(Issue.objects.count(), 40)
+        self.assertEqual(Project.objects.count(), 4)
+
+
+class ProjectSearchTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.issue = Issue.objects.create(title='Écran noir au démarrage', description="L'application se fige",
+                                          project=self.project, author_user=self.user, assignee_user=self.user)
+        self.comment = Comment.objects.create(description='Reproduit sur un écran externe', issue=self.issue,
+                                              author_user=self.user)
+        self.url = reverse('project-search', args=[self.project.id])
+
+    def search(self, text):
+        return [(result['kind'], result['id']) for result in self.client.get(self.url, {'q': text}).data['results']]
+
+    def test_ranking_and_snippet(self):
+        response = self.client.get(self.url, {'q': 'ecran'})
+        self.assertEqual([(r['kind'], r['id']) for r in response.data['results']],
+                         [('issue', self.issue.id), ('comment', self.comment.id)])
+        self.assertIn('[Écran]', response.data['results'][0]['snippet'])
+
+    def test_index_follows_writes(self):
+        self.issue.title = 'Plantage au démarrage'
+        self.issue.save()
+        self.assertEqual(self.search('écran'), [('comment', self.comment.id)])
+        self.assertEqual(self.search('plant'), [('issue', self.issue.id)])
+        self.comment.delete()
+        self.assertEqual(self.search('externe'), [])
+
+    def test_scoped_to_project(self):
+        other = self.create_project(self.user, title='Autre projet')
+        Issue.objects.create(title='Écran', description='D', project=other, author_user=self.user,
+                             assignee_user=self.user)
+        self.assertEqual(self.search('écran'), [('issue', self.issue.id), ('comment', self.comment.id)])
+
+    def test_non_contributor(self):
+        self.client.force_authenticate(User.objects.create_user(email='other@test.fr', password='secret'))
+        self.assertEqual(self.client.get(self.url, {'q': 'écran'}).status_code, 400)
+
+    def test_rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM projects_search")
+        self.assertEqual(self.search('écran'), [])
+        call_command('rebuild_search_index', stdout=mock.Mock())
+        self.assertEqual(self.search('écran'), [('issue', self.issue.id), ('comment', self.comment.id)])
+
+
+class KeysetPaginationTests(ProjectTestCase):
+
+    def test_walk_issue_pages(self):
+        self.create_issues(self.project, 7, 0)
+        url = reverse('issue', args=[self.project.id]) + '?page_size=3'
+        ids = []
+        self.client.get(url)
+        while url:
+            with self.assertNumQueries(3) as context:
+                response = self.client.get(url)
+            self.assertFalse(any('COUNT(' in query['sql'] for query in context.captured_queries))
+            ids += [issue['id'] for issue in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, list(Issue.objects.order_by('created_time', 'id').values_list('id', flat=True)))
+
+    def test_invalid_cursor(self):
+        self.create_issues(self.project, 1, 0)
+        response = self.client.get(reverse('issue', args=[self.project.id]), {'cursor': 'invalide'})
+        self.assertEqual(response.status_code, 404)
+
+
+class IssueFilterTests(ProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_issues(self.project, 4, 0)
+        self.issues = list(Issue.objects.order_by('id'))
+        self.other = User.objects.create_user(email='other@test.fr', password='secret')
+        Issue.objects.filter(id__in=[self.issues[1].id, self.issues[2].id]).update(
+            status=Issue.IN_PROGRESS, assignee_user=self.other)
+        Issue.objects.filter(id=self.issues[2].id).update(priority=Issue.HIGH_PRIORITY)
+        self.url = reverse('issue', args=[self.project.id])
+
+    def get_ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [issue['id'] for issue in response.data['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.get_ids(status=Issue.IN_PROGRESS), [self.issues[1].id, self.issues[2].id])
+        self.assertEqual(self.get_ids(status=Issue.IN_PROGRESS, priority=Issue.HIGH_PRIORITY), [self.issues[2].id])
+        self.assertEqual(self.get_ids(assignee_user=self.user.id), [self.issues[0].id, self.issues[3].id])
+        self.assertEqual(self.get_ids(author_user=self.other.id), [])
+        self.assertEqual(self.get_ids(created_after=self.issues[3].created_time.isoformat()), [self.issues[3].id])
+        self.assertEqual(self.get_ids(created_before=self.issues[1].created_time.isoformat()), [self.issues[0].id])
+
+    def test_ordering_with_pagination(self):
+        response = self.client.get(self.url, {'ordering': '-created_time', 'page_size': 3})
+        ids = [issue['id'] for issue in response.data['results']]
+        ids += [issue['id'] for issue in self.client.get(response.data['next']).data['results']]
+        self.assertEqual(ids, [issue.id for issue in reversed(self.issues)])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'status': 'XX'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ordering': 'title'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ordering': '-updated_time'}).status_code, 400)
+
+
+@override_settings(ROOT_URLCONF='core.urls_asgi')
+class AsyncReadTests(TransactionTestCase):
+    """ Vues asynchrones de core/urls_asgi.py : les lectures s'exécutent dans le pool de threads,
+        sur des connexions distinctes, d'où un TransactionTestCase
+    """
+
+    def setUp(self):
+        membership.cache.clear()
+        response_cache.backend.clear()
+        self.user = User.objects.create_user(email='owner@test.fr', password='secret')
+        self.project = ProjectTestCase.create_project(self, self.user)
+        self.issue = Issue.objects.create(title='Problème', description='Description', project=self.project,
+                                          author_user=self.user, assignee_user=self.user)
+        self.headers = {'authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def test_concurrent_reads(self):
+        urls = [reverse('project-detail', args=[self.project.id]), reverse('issue', args=[self.project.id]),
+                reverse('issue-detail', args=[self.project.id, self.issue.id])] * 3
+        responses = await asyncio.gather(*(self.async_client.get(url, **self.headers) for url in urls))
+        self.assertEqual([response.status_code for response in responses], [200] * len(urls))
+        self.assertEqual(json.loads(responses[1].content)['results'][0]['id'], self.issue.id)
+
+    async def test_slow_reads_overlap(self):
+        """ Des lectures lentes simultanées avancent en parallèle : aucun middleware ne les sérialise """
+        intervals = []
+        get_etag = ProjectDetail.get_etag
+
+        def slow_get_etag(view, request):
+            start = time.monotonic()
+            time.sleep(0.2)
+            intervals.append((start, time.monotonic()))
+            return get_etag(view, request)
+
+        url = reverse('project-detail', args=[self.project.id])
+        with mock.patch.object(ProjectDetail, 'get_etag', slow_get_etag):
+            responses = await asyncio.gather(*(self.async_client.get(url, **self.headers) for _ in range(4)))
+        self.assertEqual([response.status_code for response in responses], [200] * 4)
+        self.assertLess(max(start for start, _ in intervals), min(end for _, end in intervals))
+
+    async def test_permissions(self):
+        response = await self.async_client.get(reverse('issue', args=[self.project.id]))
+        self.assertEqual(response.status_code, 400)
+
+    async def test_export(self):
+        """ Le contenu de l'export est lu par le serveur ASGI dans la boucle d'événements, sans accès à la base """
+        url = reverse('project-export', args=[self.project.id])
+        response = await self.async_client.get(url, **{'accept-encoding': 'gzip'}, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        records = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual([json.loads(line)['model'] for line in records],
+                         ['project', 'contributor', 'contributor', 'issue'])
+
+    async def test_writes(self):
+        response = await self.async_client.post(reverse('issue', args=[self.project.id]),
+                                                {'title': 'Nouveau', 'description': 'D'},
+                                                content_type='application/json', **self.headers)
+        self.assertEqual(response.status_code, 201)
+
+
+class LoadTestTests(TransactionTestCase):
+    """ Les threads de charge ont leurs propres connexions, d'où un TransactionTestCase """
+
+    def setUp(self):
+        membership.cache.clear()
+        response_cache.backend.clear()
+        call_command('seed_benchmark', '--users', '6', '--projects', '2', '--contributors', '4', '--issues', '10',
+                     '--comments', '20', stdout=mock.Mock())
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def test_mixed_workload(self):
+        call_command('loadtest', '--users', '4', '--threads', '2', '--requests', '10', '--duration', '60',
+                     '--mix', 'read_issue=1,post_comment=1,add_contributor=1', '--output', self.path,
+                     stdout=mock.Mock())
+        with open(self.path) as file:
+            result = json.load(file)
+        self.assertEqual(result['operations']['login']['ok'], 4)
+        self.assertEqual(result['total']['requests'], 4 + 2 * 10)
+        self.assertEqual(result['total']['error'] + result['total']['locked'] + result['total']['network'], 0)
+        self.assertEqual(Comment.objects.count(), 20 + result['operations'].get('post_comment', {}).get('ok', 0))
+
+    def test_login_retried_after_server_error(self):
+        transport = mock.Mock()
+        transport.request.side_effect = [(503, b'', None), (200, b'{"access": "jeton"}', None),
+                                         (401, b'{}', None)]
+        users = [{'id': 1, 'email': 'a@test.fr'}, {'id': 2, 'email': 'b@test.fr'}]
+        virtual = loadtest.VirtualUsers(transport, {}, users, {'read_issue': 1}, 'secret', seed=0)
+        self.assertIsNone(virtual.login(users[0]))
+        self.assertEqual(virtual.login(users[0]), 'jeton')
+        self.assertIsNone(virtual.login(users[1]))
+        self.assertEqual(virtual.users, [users[0]])
+
+    def test_invalid_mix(self):
+        with self.assertRaises(CommandError):
+            call_command('loadtest', '--mix', 'delete_everything=1', stdout=mock.Mock())
+
+
+def write(request):
+    """ Écrit puis répond avec le statut demandé, ou lève une exception """
+    Project.objects.create(title='Projet', description='Description',
+                           author_user_id=User.objects.values_list('id', flat=True).get())
+    if request.GET['status'] == 'exception':
+        raise ValueError('Échec après une écriture')
+    return HttpResponse(status=int(request.GET['status']))
+
+
+@transaction.non_atomic_requests
+def non_atomic_write(request):
+    return write(request)
+
+
+urlpatterns = [
+    path('write/', write),
+    path('non-atomic/', non_atomic_write),
+]
+
+
+@override_settings(ROOT_URLCONF='projects.tests')
+class WriteTransactionTests(TransactionTestCase):
+    """ Profil de production de SQLite : moteur core.db et WriteTransactionMiddleware """
+
+    def setUp(self):
+        User.objects.create_user(email='owner@test.fr', password='secret')
+        self.client.raise_request_exception = False
+
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_checkpoint_on_close(self):
+        self.client.post('/write/?status=201')
+        wal = f"{connection.settings_dict['NAME']}-wal"
+        self.assertGreater(os.path.getsize(wal), 0)
+        connection.close()
+        self.assertEqual(os.path.getsize(wal) if os.path.exists(wal) else 0, 0)
+
+    def test_begin_immediate(self):
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record), transaction.atomic():
+            Project.objects.exists()
+        self.assertEqual(statements[0], 'BEGIN IMMEDIATE')
+
+    def test_errors_rolled_back(self):
+        self.assertEqual(self.client.post('/write/?status=400').status_code, 400)
+        self.assertEqual(self.client.post('/write/?status=exception').status_code, 500)
+        self.assertFalse(Project.objects.exists())
+        self.assertEqual(self.client.post('/write/?status=201').status_code, 201)
+        self.assertEqual(self.client.post('/non-atomic/?status=400').status_code, 400)
+        self.assertEqual(Project.objects.count(), 2)
+
+    async def test_asgi_errors_rolled_back(self):
+        self.async_client.raise_request_exception = False
+        self.assertEqual((await self.async_client.post('/write/?status=400')).status_code, 400)
+        self.assertEqual((await self.async_client.post('/write/?status=exception')).status_code, 500)
+        self.assertEqual((await self.async_client.post('/write/?status=201')).status_code, 201)
+        self.assertEqual(await sync_to_async(Project.objects.count)(), 1)
+
+
+class QueryPlanTests(ProjectTestCase):
+    """ Vérifie avec EXPLAIN QUERY PLAN (SQLite) que chaque requête fréquente des vues et des permissions
+        passe par un index : chaque table est lue par SEARCH et jamais par SCAN, et aucun tri temporaire
+        n'est nécessaire pour la pagination.
+        Pour inspecter un plan à la main : print(queryset.explain())
+    """
+
+    def assertUsesIndex(self, queryset, sorted_by_index=True):
+        plan = queryset.explain()
+        self.assertNotRegex(plan, r'\bSCAN (?!CONSTANT ROW)', plan)
+        if sorted_by_index:
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_contributor_access_paths(self):
+        self.assertUsesIndex(Contributor.objects.filter(project_id=1).values_list('user_id', 'role'))
+        self.assertUsesIndex(Contributor.objects.filter(user_id=1).values_list('project_id', 'role'))
+        self.assertUsesIndex(Contributor.objects.filter(project_id=1, role='C').order_by('created_time', 'id'))
+
+    def test_project_list(self):
+        projects = Contributor.objects.filter(user_id=1).values_list('project_id')
+        self.assertUsesIndex(Project.objects.filter(id__in=projects).order_by('created_time', 'id'),
+                             sorted_by_index=False)
+
+    def test_issue_access_paths(self):
+        self.assertUsesIndex(Issue.objects.filter(project_id=1).order_by('created_time', 'id'))
+        self.assertUsesIndex(Issue.objects.filter(project_id=1, pk=1))
+        self.assertUsesIndex(Issue.objects.filter(assignee_user_id=1, status=Issue.TO_DO))
+        for name, value in [('status', Issue.TO_DO), ('priority', Issue.LOW_PRIORITY), ('tag', Issue.BUG),
+                            ('assignee_user_id', 1), ('author_user_id', 1)]:
+            self.assertUsesIndex(Issue.objects.filter(project_id=1, **{name: value}).order_by('created_time', 'id'))
+
+    def test_comment_access_paths(self):
+        self.assertUsesIndex(Comment.objects.filter(issue_id=1).order_by('created_time', 'id'))
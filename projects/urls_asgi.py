@@ -0,0 +1,17 @@
+from django.urls import path
+
+from projects import views
+from projects.asynchronous import async_read
+
+# Lectures fréquentes servies par des vues asynchrones sous ASGI (core/urls_asgi.py), ainsi que l'export,
+# dont le contenu lit la base. Les autres adresses des projets restent celles de projects/urls.py
+urlpatterns = [
+    path('', async_read(views.ProjectListCreate), name='project'),
+    path('<int:pk>/', async_read(views.ProjectDetail), name='project-detail'),
+    path('<int:id_project>/issues/', async_read(views.IssueListCreate), name='issue'),
+    path('<int:id_project>/issues/<int:pk>/', async_read(views.IssueDetail), name='issue-detail'),
+    path('<int:id_project>/issues/<int:id_issue>/comments/', async_read(views.CommentListCreate), name='comment'),
+    path('<int:id_project>/issues/<int:id_issue>/comments/<int:pk>/', async_read(views.CommentDetail),
+         name='comment-detail'),
+    path('<int:id_project>/export/', async_read(views.ProjectExport), name='project-export'),
+]
@@ -1,12 +1,28 @@
-from rest_framework import generics
+from rest_framework import generics, serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Project, Issue, Comment
-from .serializers import (WriteProjectSerializer,
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from .bulk import bulk_create_with_ids, update_returning_ids
+from .cache import CachedRetrieveMixin
+from .conditional import ConditionalRetrieveMixin
+from .changes import changes_since, latest_cursor, record as record_changes
+from .models import Project, Issue, Comment, Change
+from . import export, search, stats
+from .signals import issues_bulk_created, issues_bulk_updated
+from .serializers import (BulkIssueSerializer,
+                          BulkIssueUpdateSerializer,
+                          IssueListFilterSerializer,
+                          WriteProjectSerializer,
                           ReadProjectSerializer,
                           WriteIssueSerializer,
                           ReadIssueSerializer,
@@ -19,8 +35,11 @@ from contributors.permissions import (ProjectPermissions,
                                       CommentPermissions,
                                       UserPermissions)
 
+from contributors.membership import bulk_changes, project_members, user_roles
 from contributors.models import Contributor
 
+User = get_user_model()
+
 
 class ProjectListCreate(generics.ListCreateAPIView):
     """ - Creation d'un projet et lecture des projets auquels l'utilisateur connecté contribue
@@ -34,9 +53,9 @@ class ProjectListCreate(generics.ListCreateAPIView):
 
     def get_queryset(self):
         projects = Contributor.objects.filter(user_id=self.request.user.id).values_list('project_id')
-        if not projects:
+        if not projects.exists():
             raise ValidationError("Vous n'avez pas encore créé de projet.")
-        return Project.objects.filter(id__in=projects)
+        return ReadProjectSerializer.setup_queryset(Project.objects.filter(id__in=projects), self.request)
 
     def perform_create(self, serializer):
         user_connected = self.request.user
@@ -45,10 +64,12 @@ class ProjectListCreate(generics.ListCreateAPIView):
         Contributor.objects.create(project=instance, user_id=user_connected.id, role='C')
 
 
-class ProjectDetail(generics.RetrieveUpdateDestroyAPIView):
+class ProjectDetail(ConditionalRetrieveMixin, CachedRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     """ - Lecture d'un projet par son créateur ou un contributeur auquel il contribue
         - Seul le créateur d'un projet peut l'effacer ou l'actualiser
     """
+    cache_resource = 'project'
+    cache_project_kwarg = 'pk'
     permission_classes = [ProjectPermissions]
 
     def get_serializer_class(self):
@@ -59,10 +80,15 @@ class ProjectDetail(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         pk_project = self.kwargs.get('pk')
         projects = Project.objects.filter(pk=pk_project)
-        if not projects:
+        if not projects.exists():
             raise ValidationError(f"Le projet {pk_project} n'existe pas.")
+        if self.request.method == 'GET':
+            return ReadProjectSerializer.setup_queryset(projects, self.request)
         return projects
 
+    def get_version_queryset(self):
+        return Project.objects.filter(pk=self.kwargs.get('pk'))
+
     def perform_update(self, serializer):
         project = Project.objects.filter(pk=self.kwargs.get('pk'))
         serializer.save(project=project)
@@ -79,7 +105,8 @@ class ProjectDetail(generics.RetrieveUpdateDestroyAPIView):
 
 class IssueListCreate(generics.ListCreateAPIView):
     """ - Creation d'un problème associé à un projet
-        - Lecture des problèmes associés à un projet
+        - Lecture des problèmes associés à un projet, filtrés et triés par les paramètres de requête
+          (voir IssueListFilterSerializer)
         - Seuls les contributeurs sont autorisés à créer ou lire les problèmes d'un projet """
     permission_classes = [IssuePermissions]
 
@@ -91,29 +118,92 @@ class IssueListCreate(generics.ListCreateAPIView):
     def get_queryset(self):
         pk_project = self.kwargs.get('id_project')
         issues = Issue.objects.filter(project=pk_project)
-        if not issues:
+        if not issues.exists():
             raise ValidationError(f"Le projet {pk_project} n'a pas de problème.")
-        return issues
+        params = IssueListFilterSerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        self.ordering = params.get_ordering()
+        issues = issues.filter(**params.get_filters())
+        return ReadIssueSerializer.setup_queryset(issues, self.request, required=(self.ordering[0].lstrip('-'),))
+
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.bulk_create(request)
+        return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         user_connected = self.request.user
         pk_project = self.kwargs.get('id_project')
-        # issue = Project.objects.get(pk=pk)
-        issue = get_object_or_404(Project, pk=pk_project)
-        assignee_user = serializer.validated_data['assignee_user']
-        users_project = Contributor.objects.filter(project_id=pk_project).values_list('user_id', flat=True)
-        if assignee_user.id not in users_project:
+        assignee_user = serializer.validated_data.pop('assignee_user', None) or user_connected
+        if assignee_user.id not in project_members(pk_project):
             raise ValidationError(f"L'utilisateur assigné doit être un contributeur du projet {pk_project}.")
-        issue.assignee_user = serializer.validated_data['assignee_user']
-        issue.author_user = user_connected
-        issue.save()
-        serializer.save(project=issue, author_user=user_connected)
-
+        serializer.save(project_id=pk_project, author_user_id=user_connected.id, assignee_user_id=assignee_user.id)
+
+    def bulk_create(self, request):
+        """ Création en masse à partir d'une liste JSON :
+            - tous les éléments sont validés, les assignés contre un seul ensemble de membres du projet
+            - tout ou rien : si un élément est invalide, aucun problème n'est créé et la réponse
+              donne les erreurs de chaque élément (dans l'ordre de la requête)
+            - les problèmes sont insérés par bulk_create dans une seule transaction
+        """
+        pk_project = self.kwargs.get('id_project')
+        context = self.get_serializer_context()
+        context['members'] = project_members(pk_project)
+        serializer = BulkIssueSerializer(data=request.data, many=True, context=context)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        issues = [Issue(project_id=pk_project, author_user_id=request.user.id,
+                        assignee_user_id=data.pop('assignee_user', request.user.id), **data)
+                  for data in serializer.validated_data]
+        with transaction.atomic():
+            bulk_create_with_ids(Issue, issues)
+            issues_bulk_created.send(sender=Issue, project_id=pk_project, ids=[issue.id for issue in issues])
+        return Response([{'id': issue.id, 'title': issue.title} for issue in issues],
+                        status=status.HTTP_201_CREATED)
+
+
+class IssueBulkUpdate(APIView):
+    """ - Modification en masse du statut, de la priorité ou de l'assigné des problèmes d'un projet,
+          désignés par leurs identifiants ou par un filtre (statut, étiquette, assigné)
+        - Seuls les problèmes dont l'utilisateur connecté est l'auteur peuvent être modifiés
+        - L'autorisation est vérifiée une seule fois et la modification tient en un seul UPDATE,
+          qui retourne les identifiants des problèmes modifiés (RETURNING)
+    """
+    permission_classes = [IssuePermissions]
 
-class IssueDetail(generics.RetrieveUpdateDestroyAPIView):
+    def patch(self, request, id_project):
+        context = {'request': request, 'members': project_members(id_project)}
+        serializer = BulkIssueUpdateSerializer(data=request.data, context=context)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        changes = {self.column(name): value for name, value in data['changes'].items()}
+        issues = Issue.objects.filter(project_id=id_project, author_user_id=request.user.id)
+
+        if 'ids' in data:
+            issues = issues.filter(id__in=data['ids'])
+        else:
+            issues = issues.filter(**{self.column(name): value for name, value in data['filter'].items()})
+
+        with transaction.atomic():
+            ids = update_returning_ids(issues, updated_time=timezone.now(), **changes)
+            refused = set(data.get('ids', ())).difference(ids)
+            if refused:
+                raise ValidationError(f"Les problèmes {sorted(refused)} n'existent pas dans le projet {id_project}"
+                                      " ou vous n'en êtes pas l'auteur.")
+            issues_bulk_updated.send(sender=Issue, project_id=id_project, ids=ids, changes=changes)
+        return Response({'updated': len(ids), 'ids': ids}, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def column(name):
+        return 'assignee_user_id' if name == 'assignee_user' else name
+
+
+class IssueDetail(ConditionalRetrieveMixin, CachedRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     """ - Lecture par un contributeur d'un problème associé à un projet auquel il contribue
         - Seul l'auteur du problème peut l'effacer ou l'actualiser
     """
+    cache_resource = 'issue'
 
     permission_classes = [IssuePermissions]
 
@@ -126,10 +216,15 @@ class IssueDetail(generics.RetrieveUpdateDestroyAPIView):
         pk_project = self.kwargs.get('id_project')
         pk_issue = self.kwargs.get('pk')
         issues_list = Issue.objects.filter(project=pk_project)
-        if pk_issue not in issues_list.values_list('id', flat=True):
+        if not issues_list.filter(pk=pk_issue).exists():
             raise ValidationError(f"Le projet {pk_project} n'a pas de problème {pk_issue}.")
+        if self.request.method == 'GET':
+            return ReadIssueSerializer.setup_queryset(issues_list, self.request)
         return issues_list
 
+    def get_version_queryset(self):
+        return Issue.objects.filter(pk=self.kwargs.get('pk'), project_id=self.kwargs.get('id_project'))
+
     def perform_update(self, serializer):
         projet = Project.objects.get(pk=self.kwargs.get('id_project'))
         serializer.save(project=projet)
@@ -155,13 +250,12 @@ class CommentListCreate(generics.ListCreateAPIView):
     def get_queryset(self):
         pk_issue = self.kwargs.get('id_issue')
         pk_project = self.kwargs.get('id_project')
-        issues_list = Issue.objects.filter(project=pk_project).values_list('id', flat=True)
-        if pk_issue not in issues_list:
+        if not Issue.objects.filter(project=pk_project, pk=pk_issue).exists():
             raise ValidationError(f"Le projet {pk_project} n'a pas de problème {pk_issue}.")
         comments = Comment.objects.filter(issue_id=pk_issue)
-        if not comments:
+        if not comments.exists():
             raise ValidationError(f"Le problème {pk_issue} du projet {pk_project} n'a pas de commentaire.")
-        return comments
+        return ReadCommentSerializer.setup_queryset(comments, self.request)
 
     def perform_create(self, serializer):
         pk_issue = self.kwargs.get('id_issue')
@@ -169,10 +263,10 @@ class CommentListCreate(generics.ListCreateAPIView):
         issue = Issue.objects.filter(pk=pk_issue)
         if not issue:
             raise ValidationError(f"Le problème {pk_issue} n'existe pas dans le projet {pk_project}.")
-        serializer.save(issue=issue.first(), author_user=self.request.user)
+        serializer.save(issue=issue.first(), author_user_id=self.request.user.id)
 
 
-class CommentDetail(generics.RetrieveUpdateDestroyAPIView):
+class CommentDetail(ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [CommentPermissions]
 
     def get_serializer_class(self):
@@ -193,6 +287,10 @@ class CommentDetail(generics.RetrieveUpdateDestroyAPIView):
             raise ValidationError(f"Le problème {pk_issue} du projet {pk_project} n'a pas de commentaire {pk_comment}.")
         return comments_list
 
+    def get_version_queryset(self):
+        return Comment.objects.filter(pk=self.kwargs.get('pk'), issue_id=self.kwargs.get('id_issue'),
+                                      issue__project_id=self.kwargs.get('id_project'))
+
     def perform_update(self, serializer):
         comment = get_object_or_404(Issue, pk=self.kwargs.get('id_issue'))
         serializer.save(comment=comment)
@@ -222,22 +320,74 @@ class UserProject(generics.ListCreateAPIView):
 
     def get_queryset(self):
         pk_project = self.kwargs.get('id_project')
-        users = Contributor.objects.filter(project_id=pk_project, role='C')
-
-        if not users:
+        roles = user_roles(self.request, pk_project)
+        if roles is None:
             raise ValidationError(f"Le projet {pk_project} n'existe pas.")
-        if self.request.user.id not in users.values_list('user_id', flat=True):
+        if Contributor.CONTRIBUTOR not in roles:
             raise ValidationError(f"Vous n'êtes pas contributeur du projet {pk_project}.")
-        return users
+        return Contributor.objects.filter(project_id=pk_project, role='C')
 
     def perform_create(self, serializer):
         pk_project = self.kwargs.get('id_project')
-        users_project = Contributor.objects.filter(project_id=pk_project).values_list('user_id', flat=True)
         user_to_add = serializer.validated_data.get('user')
-        if user_to_add.id in users_project:
+        if user_to_add.id in project_members(pk_project):
             raise ValidationError(f"L'utilisateur {user_to_add.id} est déjà dans le projet {pk_project}")
         serializer.save(project_id=pk_project, role='C')
 
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.bulk_add(request)
+        return super().create(request, *args, **kwargs)
+
+    def resolve_users(self, request):
+        """ Résout en une seule requête la liste d'utilisateurs (identifiants ou emails) de la requête.
+            Retourne {user_id: est déjà contributeur}, l'appartenance étant calculée en SQL.
+        """
+        pk_project = self.kwargs.get('id_project')
+        users_field = serializers.ListField(child=serializers.CharField(), allow_empty=False, max_length=1000)
+        values = users_field.run_validation(request.data)
+        ids = {int(value) for value in values if value.isdigit()}
+        emails = {value for value in values if not value.isdigit()}
+        members = Contributor.objects.filter(project_id=pk_project, user_id=OuterRef('pk'), role='C')
+        users = (User.objects.filter(Q(id__in=ids) | Q(email__in=emails))
+                 .annotate(is_member=Exists(members)).values_list('id', 'email', 'is_member'))
+        resolved = {user_id: is_member for user_id, email, is_member in users}
+        unknown = ids.difference(resolved).union(emails.difference(email for _, email, _ in users))
+        if unknown:
+            raise ValidationError(f"Utilisateurs inconnus : {', '.join(sorted(map(str, unknown)))}.")
+        return resolved
+
+    def bulk_add(self, request):
+        """ Ajout en masse de contributeurs, désignés par identifiant ou par email.
+            Les utilisateurs déjà contributeurs sont ignorés.
+        """
+        pk_project = self.kwargs.get('id_project')
+        resolved = self.resolve_users(request)
+        added = sorted(user_id for user_id, is_member in resolved.items() if not is_member)
+        with transaction.atomic(), bulk_changes(pk_project, added):
+            contributors = bulk_create_with_ids(Contributor, [Contributor(project_id=pk_project, user_id=user_id,
+                                                                          role='C') for user_id in added])
+            record_changes(pk_project, Change.CONTRIBUTOR, [contributor.id for contributor in contributors],
+                           Change.CREATED)
+        return Response({'added': added, 'skipped': sorted(set(resolved).difference(added))},
+                        status=status.HTTP_201_CREATED)
+
+    def delete(self, request, id_project):
+        """ Retrait en masse de contributeurs, désignés par identifiant ou par email.
+            Les utilisateurs qui ne sont pas contributeurs sont ignorés.
+        """
+        resolved = self.resolve_users(request)
+        if request.user.id in resolved:
+            raise ValidationError(f"Vous ne pouvez pas supprimer le responsable du projet {id_project}.")
+        removed = sorted(user_id for user_id, is_member in resolved.items() if is_member)
+        contributors = Contributor.objects.filter(project_id=id_project, user_id__in=removed)
+        with transaction.atomic(), bulk_changes(id_project, removed):
+            record_changes(id_project, Change.CONTRIBUTOR, [contributor.id for contributor in contributors],
+                           Change.DELETED)
+            contributors.delete()
+        return Response({'removed': removed, 'skipped': sorted(set(resolved).difference(removed))},
+                        status=status.HTTP_200_OK)
+
 
 class DelUserProject(APIView):
     """ - Supprime un contributeur d'un projet
@@ -248,8 +398,89 @@ class DelUserProject(APIView):
     def delete(self, request, id_project, pk):
         if self.request.user.pk == pk:
             raise ValidationError(f"Vous ne pouvez pas supprimer le responsable du projet {id_project}.")
-        user = Contributor.objects.filter(project_id=id_project, user_id=pk)
-        if not user:
+        if pk not in project_members(id_project):
             raise ValidationError(f"L'utilisateur {pk} n'est pas dans le projet {id_project}")
-        user.delete()
+        Contributor.objects.filter(project_id=id_project, user_id=pk).delete()
         return Response(f"L'utilisateur {pk} du projet {id_project} est supprimé.", status=status.HTTP_204_NO_CONTENT)
+
+
+class ProjectChanges(APIView):
+    """ - Synchronisation différentielle : problèmes, commentaires et contributeurs du projet
+          créés, modifiés ou supprimés depuis le curseur ?since=
+        - Sans curseur, renvoie seulement le curseur courant, à utiliser après une lecture complète du projet
+        - Seuls les contributeurs du projet peuvent lire ses modifications
+    """
+    permission_classes = [IssuePermissions]
+    limit = 1000
+
+    def get(self, request, id_project):
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'cursor': str(latest_cursor(id_project)), 'more': False})
+        if not since.isdigit():
+            raise ValidationError("Le curseur since doit être un entier positif.")
+
+        delta, cursor, more = changes_since(id_project, int(since), self.limit)
+        issues = ReadIssueSerializer.setup_queryset(
+            Issue.objects.filter(project_id=id_project, id__in=delta[Change.ISSUE]['updated']), request)
+        comments = Comment.objects.filter(issue__project_id=id_project, id__in=delta[Change.COMMENT]['updated'])
+        contributors = Contributor.objects.filter(project_id=id_project, id__in=delta[Change.CONTRIBUTOR]['updated'])
+        context = {'request': request}
+        return Response({
+            'cursor': str(cursor),
+            'more': more,
+            'issues': {'updated': ReadIssueSerializer(issues, many=True, context=context).data,
+                       'deleted': delta[Change.ISSUE]['deleted']},
+            'comments': {'updated': ReadCommentSerializer(comments, many=True, context=context).data,
+                         'deleted': delta[Change.COMMENT]['deleted']},
+            'contributors': {'updated': ReadContributorSerializer(contributors, many=True).data,
+                             'deleted': delta[Change.CONTRIBUTOR]['deleted']},
+        })
+
+
+class ProjectStats(APIView):
+    """ - Nombre de problèmes du projet par statut, priorité et étiquette, et nombre de commentaires
+        - Lu sur les compteurs tenus à jour à chaque écriture, sans parcourir les problèmes
+        - Seuls les contributeurs du projet peuvent lire ses statistiques
+    """
+    permission_classes = [IssuePermissions]
+
+    def get(self, request, id_project):
+        return Response(stats.read(id_project))
+
+
+class ProjectExport(APIView):
+    """ - Export NDJSON du projet : une ligne par projet, contributeur, problème et commentaire
+        - La réponse est produite au fil de la lecture, compressée en gzip si le client l'accepte
+        - Seuls les contributeurs du projet peuvent l'exporter
+    """
+    permission_classes = [IssuePermissions]
+
+    def get(self, request, id_project):
+        content = export.buffered(export.project_records(id_project))
+        gzip = export.accepts_gzip(request)
+        if gzip:
+            content = compress_sequence(content)
+        response = StreamingHttpResponse(content, content_type='application/x-ndjson; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="projet-{id_project}.ndjson"'
+        if gzip:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class ProjectSearch(APIView):
+    """ - Recherche plein texte ?q= dans les titres et descriptions des problèmes et des commentaires du projet
+        - Résultats classés par pertinence (bm25, le titre pèse plus que la description), avec un extrait
+        - Seuls les contributeurs du projet peuvent y faire une recherche
+    """
+    permission_classes = [IssuePermissions]
+    limit = 50
+
+    def get(self, request, id_project):
+        if not search.available():
+            raise ValidationError("La recherche plein texte n'est disponible qu'avec SQLite.")
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError("Indiquez le texte à rechercher (paramètre q).")
+        return Response({'results': search.search(id_project, text, self.limit)})
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from contributors.membership import MembershipCache
+
+User = get_user_model()
+
+# Même cache LRU + TTL que les membres des projets : {user_id: (is_active, membership_version)}
+_options = getattr(settings, 'USER_CACHE', {})
+cache = MembershipCache(max_entries=_options.get('MAX_ENTRIES', 10000), timeout=_options.get('TIMEOUT', 60))
+
+
+def user_state(user_id):
+    """ (is_active, membership_version) de l'utilisateur, None s'il n'existe pas """
+    state = cache.get(user_id)
+    if state is None:
+        state = User.objects.filter(pk=user_id).values_list('is_active', 'membership_version').first()
+        if state is not None:
+            cache.set(user_id, state)
+    return state
+
+
+def forget_users(user_ids):
+    for user_id in user_ids:
+        cache.delete(user_id)
+
+
+class TokenUser:
+    """ Utilisateur connecté construit à partir du jeton et du cache, sans requête :
+        id, is_active et membership_version suffisent aux vues et aux permissions.
+        Tout autre attribut (email, is_superuser...) charge l'utilisateur en base à la première lecture.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, is_active, membership_version):
+        self.id = user_id
+        self.is_active = is_active
+        self.membership_version = membership_version
+
+    @property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def user(self):
+        return User.objects.get(pk=self.id)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.id and isinstance(other, (TokenUser, User))
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __str__(self):
+        return f"User id: {self.id}"
+
+
+class CachedUserJWTAuthentication(JWTAuthentication):
+    """ JWTAuthentication sans lecture de l'utilisateur à chaque requête :
+        l'état de l'utilisateur (actif, version des adhésions) est gardé en cache,
+        invalidé à chaque sauvegarde de l'utilisateur et à chaque modification de ses adhésions.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken("Le jeton ne contient pas d'identifiant d'utilisateur reconnaissable.")
+        state = user_state(user_id)
+        if state is None:
+            raise AuthenticationFailed("Utilisateur introuvable.", code='user_not_found')
+        is_active, membership_version = state
+        if not is_active:
+            raise AuthenticationFailed("Utilisateur inactif.", code='user_inactive')
+        return TokenUser(user_id, is_active, membership_version)
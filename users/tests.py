@@ -1,3 +1,52 @@
-from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from contributors import membership
+from contributors.models import Contributor
+from projects.models import Project
+from . import authentication
+from .models import User
+
+
+class CachedUserAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        authentication.cache.clear()
+        membership.cache.clear()
+        self.user = User.objects.create_user(email='owner@test.fr', password='secret')
+        self.project = Project.objects.create(title='Projet', description='Description', author_user_id=self.user.id)
+        Contributor.objects.create(project=self.project, user=self.user, role=Contributor.OWNER)
+        Contributor.objects.create(project=self.project, user=self.user, role=Contributor.CONTRIBUTOR)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.url = reverse('project-stats', args=[self.project.id])
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        return [query['sql'] for query in context.captured_queries if 'users_user' in query['sql']]
+
+    def test_no_user_query_on_warm_cache(self):
+        self.assertEqual(len(self.user_queries()), 1)
+        self.assertEqual(self.user_queries(), [])
+
+    def test_inactive_user(self):
+        self.user_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_membership_change_refreshes_version(self):
+        self.user_queries()
+        other = Project.objects.create(title='Autre', description='Description', author_user_id=self.user.id)
+        Contributor.objects.create(project=other, user=self.user, role=Contributor.CONTRIBUTOR)
+        self.assertIsNone(authentication.cache.get(self.user.id))
+
+    def test_lazy_user_fields(self):
+        token_user = authentication.TokenUser(self.user.id, True, 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(token_user.email, 'owner@test.fr')
+            self.assertFalse(token_user.is_superuser)
+        self.assertEqual(token_user, self.user)
@@ -1,7 +1,8 @@
+from django.db.transaction import non_atomic_requests
 from django.urls import path
 
 from users.views import UserCreate
 
 urlpatterns = [
-    path('', UserCreate.as_view(), name='signup'),
+    path('', non_atomic_requests(UserCreate.as_view()), name='signup'),
 ]